@@ -25,7 +25,7 @@ async def register_admin(admin: AdminRegister):
                 detail="Username already registered"
             )
 
-        hashed_password = get_password_hash(admin.password)
+        hashed_password = await get_password_hash(admin.password)
         new_user = await db.create_user(admin.username, admin.email, hashed_password)
         if not new_user:
             raise HTTPException(
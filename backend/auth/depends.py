@@ -11,7 +11,7 @@ logger = logging.getLogger(__name__)
 
 async def get_current_user(token: Annotated[HTTPAuthorizationCredentials, Depends(oauth2_scheme)]):
     try:
-        payload = security.verify_token(token.credentials)
+        payload = await security.verify_token(token.credentials)
         if not payload:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -27,7 +27,7 @@ async def get_current_user(token: Annotated[HTTPAuthorizationCredentials, Depend
                 headers={"WWW-Authenticate": "Bearer"},
             )
 
-        user = await db.get_user_by_username(username)
+        user = await db.get_user_identity(username)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
@@ -58,7 +58,7 @@ async def get_current_user_id(
         return None
 
     token = authorization.removeprefix("Bearer ").strip()
-    payload = security.verify_token(token)
+    payload = await security.verify_token(token)
     if not payload:
         return None
 
@@ -66,7 +66,7 @@ async def get_current_user_id(
     if not username:
         return None
 
-    user = await db.get_user_by_username(username)
+    user = await db.get_user_identity(username)
     if not user or not user.get("is_active", True):
         return None
 
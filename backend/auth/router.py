@@ -27,7 +27,7 @@ async def login(user: UserLogin, request: Request):
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect username or password"
             )
-        if not security.verify_password(user.password, db_user["password"]):
+        if not await security.verify_password(user.password, db_user["password"]):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect username or password"
@@ -77,7 +77,7 @@ async def register(user: UserRegister, request: Request):
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Username already registered"
             )
-        hashed_password = security.get_password_hash(user.password)
+        hashed_password = await security.get_password_hash(user.password)
         new_user = await db.create_user(user.username, user.email, hashed_password)
 
         ip_address = request.client.host
@@ -105,22 +105,20 @@ async def register(user: UserRegister, request: Request):
 @router.get("/me", summary="Get current user")
 async def get_current_user(token: Annotated[HTTPAuthorizationCredentials, Depends(oauth2_scheme)]):
     try:
-        payload = security.verify_token(token.credentials)
+        payload = await security.verify_token(token.credentials)
         if not payload:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid token"
             )
         username = payload.get("sub")
-        user = await db.get_user_by_username(username)
+        user = await db.get_user_identity(username)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="User not found"
             )
-        user_data = dict(user)
-        del user_data["password"]
-        return user_data
+        return user
     except HTTPException as e:
         logger.error(f"Authentication error: {str(e)}")
         raise e
@@ -135,14 +133,14 @@ async def get_current_user(token: Annotated[HTTPAuthorizationCredentials, Depend
 @router.post("/refresh", response_model=Token, summary="Refresh access token")
 async def refresh_token(refresh_data: TokenRefresh):
     try:
-        payload = security.verify_token(refresh_data.refresh_token, token_type="refresh")
+        payload = await security.verify_token(refresh_data.refresh_token, token_type="refresh")
         access_token, new_refresh_token, expires_in = security.create_tokens({"sub": payload["sub"]})
         try:
             exp = payload.get("exp", 0)
             now = datetime.utcnow().timestamp()
             ttl = int(exp - now)
             if ttl > 0:
-                security.blacklist_token(refresh_data.refresh_token, ttl)
+                await security.blacklist_token(payload, refresh_data.refresh_token, ttl)
         except Exception as e:
             logger.warning(f"Error blacklisting old refresh token: {str(e)}")
             
@@ -164,12 +162,12 @@ async def refresh_token(refresh_data: TokenRefresh):
 @router.post("/logout", status_code=status.HTTP_200_OK, summary="Logout user")
 async def logout(token: Annotated[HTTPAuthorizationCredentials, Depends(oauth2_scheme)]):
     try:
-        payload = security.verify_token(token.credentials)
+        payload = await security.verify_token(token.credentials)
         exp = payload.get("exp", 0)
         now = datetime.utcnow().timestamp()
         ttl = int(exp - now)
         if ttl > 0:
-            security.blacklist_token(token.credentials, ttl)
+            await security.blacklist_token(payload, token.credentials, ttl)
         return {"message": "Successfully logged out"}
     except Exception as e:
         logger.error(f"Logout error: {str(e)}")
@@ -178,6 +176,21 @@ async def logout(token: Annotated[HTTPAuthorizationCredentials, Depends(oauth2_s
             detail="Internal server error"
         )
 
+@router.post("/logout_all", status_code=status.HTTP_200_OK, summary="Logout user from all sessions")
+async def logout_all(token: Annotated[HTTPAuthorizationCredentials, Depends(oauth2_scheme)]):
+    try:
+        payload = await security.verify_token(token.credentials)
+        await security.revoke_all_user_tokens(payload["sub"])
+        return {"message": "Successfully logged out from all sessions"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Logout all error: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
+
 @router.post("/sellers/register", status_code=status.HTTP_201_CREATED, response_model=PendingSellerResponse)
 async def register_seller(seller: SellerRegister):
     try:
@@ -188,7 +201,7 @@ async def register_seller(seller: SellerRegister):
                 detail="Username already registered"
             )
 
-        hashed_password = security.get_password_hash(seller.password)
+        hashed_password = await security.get_password_hash(seller.password)
         new_user = await db.create_user(seller.username, seller.email, hashed_password)
         if not new_user:
             raise HTTPException(
@@ -300,7 +313,7 @@ async def register_admin(admin: AdminRegister):
                 detail="Username already registered"
             )
 
-        hashed_password = security.get_password_hash(admin.password)
+        hashed_password = await security.get_password_hash(admin.password)
         new_user = await db.create_user(admin.username, admin.email, hashed_password)
         if not new_user:
             raise HTTPException(
@@ -2,12 +2,18 @@ from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 import os
+import time
+import uuid
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from typing import Optional, Tuple
-import redis
+from redis.exceptions import RedisError
 from fastapi import HTTPException, status
 from fastapi.security import HTTPBearer
 import logging
+import db
+from local_cache import TTLCache
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -19,6 +25,16 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 REFRESH_TOKEN_EXPIRE_DAYS = 30
 
+# Revocation checks hit Redis at most once per token per TTL window; a revoked
+# token stays usable on other workers for up to this many seconds.
+REVOCATION_CACHE_TTL_SECONDS = float(os.getenv("REVOCATION_CACHE_TTL_SECONDS", "5"))
+REVOCATION_CACHE_SIZE = int(os.getenv("REVOCATION_CACHE_SIZE", "10000"))
+
+# bcrypt runs on a bounded thread pool; once every worker is busy and the
+# queue is full, new hashing requests are rejected with 429.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", "32"))
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 oauth2_scheme = HTTPBearer(
@@ -27,15 +43,68 @@ oauth2_scheme = HTTPBearer(
     auto_error=True
 )
 
-redis_client = redis.Redis(host='redis', port=6379, db=0, decode_responses=True)
+revocation_cache = TTLCache(maxsize=REVOCATION_CACHE_SIZE, ttl=REVOCATION_CACHE_TTL_SECONDS)
+
+password_hash_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASH_WORKERS,
+    thread_name_prefix="password-hash"
+)
+
+_hash_stats = {
+    "in_flight": 0,
+    "peak_in_flight": 0,
+    "completed": 0,
+    "rejected": 0,
+    "total_wait_ms": 0.0,
+}
+
+def password_hashing_stats() -> dict:
+    in_flight = _hash_stats["in_flight"]
+    return {
+        "workers": PASSWORD_HASH_WORKERS,
+        "queue_limit": PASSWORD_HASH_QUEUE_LIMIT,
+        "in_flight": in_flight,
+        "queue_depth": max(0, in_flight - PASSWORD_HASH_WORKERS),
+        "peak_in_flight": _hash_stats["peak_in_flight"],
+        "completed": _hash_stats["completed"],
+        "rejected": _hash_stats["rejected"],
+        "avg_latency_ms": round(_hash_stats["total_wait_ms"] / _hash_stats["completed"], 2)
+        if _hash_stats["completed"] else None,
+    }
 
-def verify_password(plain_password: str, stored_password: str) -> bool:
+async def _run_in_hash_pool(func, *args):
+    if _hash_stats["in_flight"] >= PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE_LIMIT:
+        _hash_stats["rejected"] += 1
+        logger.warning("Password hashing pool saturated, rejecting request")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many authentication requests, try again later",
+            headers={"Retry-After": "1"},
+        )
+
+    loop = asyncio.get_running_loop()
+    _hash_stats["in_flight"] += 1
+    _hash_stats["peak_in_flight"] = max(_hash_stats["peak_in_flight"], _hash_stats["in_flight"])
+    started = loop.time()
+    future = loop.run_in_executor(password_hash_executor, func, *args)
+
+    def release(done: asyncio.Future):
+        _hash_stats["in_flight"] -= 1
+        if not done.cancelled() and done.exception() is None:
+            _hash_stats["completed"] += 1
+            _hash_stats["total_wait_ms"] += (loop.time() - started) * 1000
+
+    future.add_done_callback(release)
+    # A cancelled request must not free the slot while its hash is still queued or running
+    return await asyncio.shield(future)
+
+async def verify_password(plain_password: str, stored_password: str) -> bool:
     if stored_password.startswith('$2b$'):
-        return pwd_context.verify(plain_password, stored_password)
+        return await _run_in_hash_pool(pwd_context.verify, plain_password, stored_password)
     return plain_password == stored_password 
 
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+async def get_password_hash(password: str) -> str:
+    return await _run_in_hash_pool(pwd_context.hash, password)
 
 def create_tokens(data: dict) -> Tuple[str, str, int]:
     access_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -44,26 +113,47 @@ def create_tokens(data: dict) -> Tuple[str, str, int]:
     access_exp = datetime.utcnow() + access_expires
     refresh_exp = datetime.utcnow() + refresh_expires
     
+    issued_at = round(time.time(), 3)
+
     to_encode = data.copy()
-    to_encode.update({"exp": access_exp, "type": "access"})
+    to_encode.update({"exp": access_exp, "iat": issued_at, "jti": uuid.uuid4().hex, "type": "access"})
     access_token = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     
-    to_encode.update({"exp": refresh_exp, "type": "refresh"})
+    to_encode.update({"exp": refresh_exp, "jti": uuid.uuid4().hex, "type": "refresh"})
     refresh_token = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     
     return access_token, refresh_token, int(access_expires.total_seconds())
 
-def verify_token(token: str, token_type: str = "access") -> dict:
+def _revocation_key(payload: dict, token: str) -> str:
+    jti = payload.get("jti")
+    if jti:
+        return f"revoked:jti:{jti}"
+    # Tokens issued before jti was introduced are still keyed by the full string
+    return f"blacklist:{token}"
+
+async def is_token_revoked(payload: dict, token: str) -> bool:
+    cache_key = payload.get("jti") or token
+    cached = revocation_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    try:
+        revoked_jti, revoked_before = await db.redis_client.mget(
+            _revocation_key(payload, token),
+            f"revoked_before:{payload['sub']}"
+        )
+    except RedisError as e:
+        logger.error(f"Redis error while checking blacklist: {str(e)}")
+        return False
+
+    revoked = bool(revoked_jti) or (
+        revoked_before is not None and float(payload.get("iat", 0)) <= float(revoked_before)
+    )
+    revocation_cache.set(cache_key, revoked)
+    return revoked
+
+async def verify_token(token: str, token_type: str = "access") -> dict:
     try:
-        try:
-            if redis_client.get(f"blacklist:{token}"):
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Token has been revoked",
-                    headers={"WWW-Authenticate": "Bearer"},
-                )
-        except redis.RedisError as e:
-            logger.error(f"Redis error while checking blacklist: {str(e)}")
         try:
             payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         except JWTError as e:
@@ -87,6 +177,13 @@ def verify_token(token: str, token_type: str = "access") -> dict:
                 detail="Invalid token claims",
                 headers={"WWW-Authenticate": "Bearer"},
             )
+
+        if await is_token_revoked(payload, token):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token has been revoked",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
             
         return payload
         
@@ -100,8 +197,21 @@ def verify_token(token: str, token_type: str = "access") -> dict:
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-def blacklist_token(token: str, expires_in: int) -> None:
+async def blacklist_token(payload: dict, token: str, expires_in: int) -> None:
+    revocation_cache.set(payload.get("jti") or token, True, ttl=expires_in)
     try:
-        redis_client.setex(f"blacklist:{token}", expires_in, "1")
-    except redis.RedisError as e:
+        await db.redis_client.setex(_revocation_key(payload, token), expires_in, "1")
+    except RedisError as e:
         logger.error(f"Redis error while blacklisting token: {e}")
+
+async def revoke_all_user_tokens(username: str) -> None:
+    revocation_cache.clear()
+    try:
+        await db.redis_client.set(
+            f"revoked_before:{username}",
+            round(time.time(), 3),
+            ex=int(timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS).total_seconds())
+        )
+    except RedisError as e:
+        logger.error(f"Redis error while revoking user tokens: {e}")
+        raise
@@ -0,0 +1,94 @@
+"""
+Insert stage of the ETL upload: the old row-by-row INSERT ... RETURNING *
+against COPY into a staging table plus one INSERT ... SELECT
+(catalog.seller.etl.load_products).
+
+Generates N valid products in memory, loads them for a throwaway seller inside
+a transaction that is rolled back, and reports wall time and rows per second.
+The row-by-row path needs one round trip per product, so it is skipped above
+--legacy-limit rows.
+
+Run from the backend directory against a live stack:
+
+    python -m benchmarks.etl_insert --sizes 10000 100000 1000000
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from decimal import Decimal
+
+import db
+from catalog.seller.etl import load_products
+
+
+class Rollback(Exception):
+    pass
+
+
+def generate_products(size: int):
+    for row in range(1, size + 1):
+        yield {
+            "row": row,
+            "product_name": f"Bench product {row}",
+            "description": f"Benchmark description {row}",
+            "category": "Benchmark",
+            "price": Decimal(100 + row % 1000),
+            "in_stock": 10,
+        }
+
+
+async def legacy_load(conn, seller_id: int, products) -> int:
+    inserted = []
+    for product in products:
+        row = await conn.fetchrow(
+            'INSERT INTO "Products" (seller_id, product_name, description, category, price, in_stock, status) '
+            'VALUES ($1, $2, $3, $4, $5, $6, $7) RETURNING *',
+            seller_id, product["product_name"], product["description"], product["category"],
+            product["price"], product["in_stock"], "waiting"
+        )
+        inserted.append(dict(row))
+    return len(inserted)
+
+
+async def measure(name: str, size: int, load):
+    try:
+        async with db.pool.acquire() as conn:
+            async with conn.transaction():
+                name_suffix = uuid.uuid4().hex[:8]
+                user_id = await conn.fetchval(
+                    'INSERT INTO "Users" (username, email, password, role) VALUES ($1, $2, $3, $4) RETURNING user_id',
+                    f"etl_bench_{name_suffix}", f"etl_bench_{name_suffix}@bench.local", "bench", "seller"
+                )
+                seller_id = await conn.fetchval(
+                    'INSERT INTO "Sellers" (user_id, description) VALUES ($1, $2) RETURNING seller_id',
+                    user_id, "benchmark seller"
+                )
+                started = time.perf_counter()
+                inserted = await load(conn, seller_id, generate_products(size))
+                elapsed = time.perf_counter() - started
+                raise Rollback()
+    except Rollback:
+        pass
+
+    print(f"{name:<10} size={size:<8} inserted={inserted:<8} time={elapsed:8.2f}s rows/s={inserted / elapsed:10.0f}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--legacy-limit", type=int, default=100000, help="largest size to run row by row")
+    args = parser.parse_args()
+
+    await db.init_db_pool()
+    try:
+        for size in args.sizes:
+            if size <= args.legacy_limit:
+                await measure("row-by-row", size, legacy_load)
+            await measure("copy", size, load_products)
+    finally:
+        await db.close_db_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
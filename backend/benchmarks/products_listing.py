@@ -0,0 +1,256 @@
+"""
+Round trips and latency of GET /catalog/products against catalog size.
+
+Compares the old per-row listing (one image query and one Redis GET/SET per
+product, whole catalog in one response) with the batched, keyset-paginated
+path in catalog.basic.products (first page of --page-size products, ratings
+read from the maintained Products.avg_rating column). Seeds a
+throwaway seller with N products, runs both paths and removes the seller
+afterwards.
+
+Run from the backend directory against a live stack:
+
+    python -m benchmarks.products_listing --sizes 100 1000 5000 --runs 30
+"""
+import argparse
+import asyncio
+import contextlib
+import statistics
+import time
+import uuid
+
+import db
+from catalog.basic import products as products_module
+
+LEGACY_QUERY = '''
+    SELECT
+        p.product_id,
+        p.seller_id,
+        u.username AS seller_name,
+        p.product_name,
+        p.description,
+        p.category,
+        p.price,
+        p.status,
+        p.in_stock,
+        ROUND(AVG(c.rating)::numeric, 2) AS avg_rating
+    FROM "Products" p
+    JOIN "Sellers" s ON p.seller_id = s.seller_id
+    JOIN "Users" u ON s.user_id = u.user_id
+    LEFT JOIN "Comments" c ON p.product_id = c.product_id
+    WHERE p.seller_id = $1
+    GROUP BY p.product_id, u.username
+    ORDER BY p.product_id
+'''
+
+
+class RoundTrips:
+    def __init__(self):
+        self.db = 0
+        self.redis = 0
+
+
+class CountingConnection:
+    def __init__(self, conn, counter: RoundTrips):
+        self._conn = conn
+        self._counter = counter
+
+    def __getattr__(self, name):
+        attr = getattr(self._conn, name)
+        if name not in ("fetch", "fetchrow", "fetchval", "execute"):
+            return attr
+
+        async def counted(*args, **kwargs):
+            self._counter.db += 1
+            return await attr(*args, **kwargs)
+        return counted
+
+
+class CountingPool:
+    def __init__(self, pool, counter: RoundTrips):
+        self._pool = pool
+        self._counter = counter
+
+    @contextlib.asynccontextmanager
+    async def acquire(self):
+        async with self._pool.acquire() as conn:
+            yield CountingConnection(conn, self._counter)
+
+
+class CountingPipeline:
+    def __init__(self, pipe, counter: RoundTrips):
+        self._pipe = pipe
+        self._counter = counter
+
+    def __len__(self):
+        return len(self._pipe)
+
+    def __getattr__(self, name):
+        return getattr(self._pipe, name)
+
+    async def execute(self):
+        self._counter.redis += 1
+        return await self._pipe.execute()
+
+
+class CountingRedis:
+    def __init__(self, client, counter: RoundTrips):
+        self._client = client
+        self._counter = counter
+
+    def pipeline(self, *args, **kwargs):
+        return CountingPipeline(self._client.pipeline(*args, **kwargs), self._counter)
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not asyncio.iscoroutinefunction(attr):
+            return attr
+
+        async def counted(*args, **kwargs):
+            self._counter.redis += 1
+            return await attr(*args, **kwargs)
+        return counted
+
+
+def legacy_rating_cache_key(product_id: int) -> str:
+    return f"product:{product_id}:avg_rating"
+
+
+async def legacy_listing(pool, redis_client, seller_id: int):
+    async with pool.acquire() as conn:
+        await conn.fetch(LEGACY_QUERY, seller_id)
+
+    products = []
+    async with pool.acquire() as conn:
+        records = await conn.fetch(LEGACY_QUERY, seller_id)
+        for p in records:
+            cache_key = legacy_rating_cache_key(p["product_id"])
+            cached = await redis_client.get(cache_key)
+            if cached is None and p["avg_rating"] is not None:
+                await redis_client.set(cache_key, str(p["avg_rating"]), ex=300)
+            image = await conn.fetchrow('''
+                SELECT image_filename FROM "Product_images"
+                WHERE product_id = $1
+                ORDER BY position ASC
+                LIMIT 1
+            ''', p["product_id"])
+            products.append((p["product_id"], image))
+    return products
+
+
+async def batched_listing(seller_id: int, page_size: int):
+    return await products_module.get_products(
+        category=None,
+        min_price=None,
+        max_price=None,
+        in_stock=None,
+        min_rating=None,
+        max_rating=None,
+        sort_by=None,
+        seller_id=seller_id,
+        limit=page_size,
+        cursor=None
+    )
+
+
+async def seed_catalog(size: int) -> tuple[int, int]:
+    async with db.pool.acquire() as conn:
+        async with conn.transaction():
+            name = f"bench_{uuid.uuid4().hex[:12]}"
+            user_id = await conn.fetchval(
+                'INSERT INTO "Users" (username, email, password, role) VALUES ($1, $2, $3, $4) RETURNING user_id',
+                name, f"{name}@bench.local", "bench", "seller"
+            )
+            seller_id = await conn.fetchval(
+                'INSERT INTO "Sellers" (user_id, description) VALUES ($1, $2) RETURNING seller_id',
+                user_id, "benchmark seller"
+            )
+            product_ids = await conn.fetch(
+                '''
+                INSERT INTO "Products" (seller_id, product_name, description, category, price, in_stock, status)
+                SELECT $1, 'Bench product ' || g, 'Benchmark description ' || g, 'Benchmark', 100 + g, 10, 'available'
+                FROM generate_series(1, $2) AS g
+                RETURNING product_id
+                ''',
+                seller_id, size
+            )
+            await conn.copy_records_to_table(
+                "Product_images",
+                records=[(r["product_id"], f"bench_{r['product_id']}.jpg", 0) for r in product_ids],
+                columns=["product_id", "image_filename", "position"]
+            )
+    return user_id, seller_id
+
+
+async def drop_catalog(user_id: int, seller_id: int):
+    async with db.pool.acquire() as conn:
+        async with conn.transaction():
+            ids = await conn.fetch('SELECT product_id FROM "Products" WHERE seller_id = $1', seller_id)
+            await conn.execute('DELETE FROM "Products" WHERE seller_id = $1', seller_id)
+            await conn.execute('DELETE FROM "Sellers" WHERE seller_id = $1', seller_id)
+            await conn.execute('DELETE FROM "Users" WHERE user_id = $1', user_id)
+    if ids:
+        await db.redis_client.delete(*[legacy_rating_cache_key(r["product_id"]) for r in ids])
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def measure(name: str, size: int, runs: int, call):
+    counter = RoundTrips()
+    latencies = []
+    for run in range(runs + 1):
+        counter.db = counter.redis = 0
+        started = time.perf_counter()
+        await call(counter)
+        elapsed = (time.perf_counter() - started) * 1000
+        if run:
+            latencies.append(elapsed)
+    print(
+        f"{name:<8} size={size:<6} db_round_trips={counter.db:<6} redis_round_trips={counter.redis:<6} "
+        f"p50={statistics.median(latencies):8.1f}ms p99={percentile(latencies, 99):8.1f}ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--page-size", type=int, default=products_module.MAX_PAGE_SIZE)
+    args = parser.parse_args()
+
+    await db.init_db_pool()
+    real_pool = db.pool
+    # Seeded rows must be visible immediately, so keep the listing on the primary
+    replica_pool, db.read_pool = db.read_pool, None
+
+    try:
+        for size in args.sizes:
+            user_id, seller_id = await seed_catalog(size)
+            try:
+                async def legacy(counter):
+                    await legacy_listing(CountingPool(real_pool, counter), CountingRedis(db.redis_client, counter), seller_id)
+
+                async def batched(counter):
+                    db.pool = CountingPool(real_pool, counter)
+                    try:
+                        await batched_listing(seller_id, args.page_size)
+                    finally:
+                        db.pool = real_pool
+
+                await measure("legacy", size, args.runs, legacy)
+                await measure("batched", size, args.runs, batched)
+            finally:
+                await drop_catalog(user_id, seller_id)
+    finally:
+        db.pool = real_pool
+        db.read_pool = replica_pool
+        await db.close_db_pool()
+        await db.redis_client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,118 @@
+"""
+Latency of /catalog/search/suggest: the old bool query (match_phrase_prefix,
+two fuzzy matches and a leading-wildcard query) against the completion
+suggester on product_suggest.
+
+Prefixes are cut from product names already in the index (1..N characters of
+the first and second word), replayed the way a user types them. Each prefix
+is sent --runs times per implementation; the report shows mean, p50, p95 and
+p99 latency.
+
+Run from the backend directory against a populated Elasticsearch:
+
+    python -m benchmarks.suggest_latency --samples 50 --runs 5
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from catalog.search.service import SearchService
+from elastic.client import get_elasticsearch_client
+from elastic.mappings import PRODUCT_INDEX_NAME
+
+
+def legacy_suggest_body(prefix: str, limit: int) -> dict:
+    return {
+        "size": limit,
+        "_source": ["product_id", "product_name", "category", "price"],
+        "query": {
+            "bool": {
+                "should": [
+                    {"match_phrase_prefix": {"product_name": {"query": prefix, "boost": 10}}},
+                    {"match": {"product_name": {"query": prefix, "fuzziness": "AUTO", "boost": 5}}},
+                    {"wildcard": {"product_name": {"value": f"*{prefix}*", "boost": 2}}},
+                    {"match": {"product_name": {"query": prefix, "fuzziness": 2, "prefix_length": 1}}}
+                ],
+                "minimum_should_match": 1,
+                "filter": [
+                    {"term": {"status": "available"}},
+                    {"range": {"in_stock": {"gt": 0}}}
+                ]
+            }
+        },
+        "sort": [
+            {"_score": "desc"},
+            {"avg_rating": {"order": "desc", "missing": "_last"}},
+            {"price": "asc"}
+        ]
+    }
+
+
+async def sample_prefixes(client, samples: int, max_length: int) -> list:
+    response = await client.search(
+        index=PRODUCT_INDEX_NAME,
+        body={"size": samples, "_source": ["product_name"], "query": {"function_score": {"random_score": {}}}}
+    )
+    prefixes = []
+    for hit in response["hits"]["hits"]:
+        for word in hit["_source"]["product_name"].split()[:2]:
+            prefixes.extend(word[:length] for length in range(1, min(len(word), max_length) + 1))
+    return prefixes
+
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def measure(name: str, prefixes: list, runs: int, suggest):
+    timings = []
+    for _ in range(runs):
+        for prefix in prefixes:
+            started = time.perf_counter()
+            await suggest(prefix)
+            timings.append((time.perf_counter() - started) * 1000)
+
+    print(
+        f"{name:<12} queries={len(timings):<6} mean={statistics.mean(timings):7.2f}ms "
+        f"p50={percentile(timings, 0.50):7.2f}ms p95={percentile(timings, 0.95):7.2f}ms "
+        f"p99={percentile(timings, 0.99):7.2f}ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=50, help="product names to cut prefixes from")
+    parser.add_argument("--max-prefix", type=int, default=6)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--limit", type=int, default=5)
+    args = parser.parse_args()
+
+    es_client = get_elasticsearch_client()
+    await es_client.initialize()
+    client = es_client.get_client()
+    service = SearchService()
+
+    try:
+        prefixes = await sample_prefixes(client, args.samples, args.max_prefix)
+        if not prefixes:
+            print("No products in the index")
+            return
+
+        async def legacy(prefix):
+            await client.search(index=PRODUCT_INDEX_NAME, body=legacy_suggest_body(prefix, args.limit))
+
+        async def completion(prefix):
+            await service.suggest_products(prefix, limit=args.limit)
+
+        # Warm up caches and the completion FST before timing
+        await measure("warmup", prefixes[:20], 1, completion)
+        await measure("legacy", prefixes, args.runs, legacy)
+        await measure("completion", prefixes, args.runs, completion)
+    finally:
+        await es_client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+"""
+Concurrent throughput of token verification with the old blocking revocation
+check versus the async Redis check with and without the in-process cache.
+
+Each simulated request verifies an access token and then yields to the event
+loop, the way an authenticated endpoint would. A ticker coroutine records the
+worst event loop stall seen while the requests run.
+
+Run from the backend directory against a live Redis:
+
+    python -m benchmarks.token_revocation_load --requests 5000 --concurrency 200
+"""
+import argparse
+import asyncio
+import time
+
+import redis
+from jose import jwt
+
+import db
+from auth import security
+
+
+def legacy_verify_token(sync_client: redis.Redis, token: str) -> dict:
+    if sync_client.get(f"blacklist:{token}"):
+        raise RuntimeError("Token has been revoked")
+    return jwt.decode(token, security.SECRET_KEY, algorithms=[security.ALGORITHM])
+
+
+async def loop_lag_monitor(stop: asyncio.Event, interval: float = 0.005) -> float:
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - started - interval)
+    return worst
+
+
+async def run_scenario(name: str, total: int, concurrency: int, verify):
+    semaphore = asyncio.Semaphore(concurrency)
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(loop_lag_monitor(stop))
+
+    async def one_request():
+        async with semaphore:
+            await verify()
+            await asyncio.sleep(0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one_request() for _ in range(total)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    worst_lag = await monitor
+
+    print(
+        f"{name:<22} requests={total:<7} concurrency={concurrency:<5} "
+        f"throughput={total / elapsed:10.1f} req/s  worst_loop_stall={worst_lag * 1000:7.1f}ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    args = parser.parse_args()
+
+    access_token, _, _ = security.create_tokens({"sub": "load_test_user"})
+    sync_client = redis.Redis(host='redis', port=6379, db=0, decode_responses=True)
+
+    async def legacy():
+        legacy_verify_token(sync_client, access_token)
+
+    async def async_uncached():
+        security.revocation_cache.clear()
+        await security.verify_token(access_token)
+
+    async def async_cached():
+        await security.verify_token(access_token)
+
+    try:
+        await run_scenario("sync redis (old)", args.requests, args.concurrency, legacy)
+        await run_scenario("async redis, no cache", args.requests, args.concurrency, async_uncached)
+        security.revocation_cache.clear()
+        await run_scenario("async redis + cache", args.requests, args.concurrency, async_cached)
+        print(f"revocation cache: {security.revocation_cache.stats()}")
+    finally:
+        sync_client.close()
+        await db.redis_client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -38,9 +38,8 @@ async def ban_user(
             'UPDATE "Users" SET is_active = FALSE WHERE user_id = $1',
             user_id
         )
-        
-        cache_key = f"user:{target_user['username']}"
-        await db.redis_client.delete(cache_key)
+
+    await db.invalidate_user(target_user["username"])
 
     return {"message": f"User {user_id} has been banned successfully"}
 
@@ -71,8 +70,7 @@ async def unban_user(
             'UPDATE "Users" SET is_active = TRUE WHERE user_id = $1',
             user_id
         )
-        
-        cache_key = f"user:{target_user['username']}"
-        await db.redis_client.delete(cache_key)
+
+    await db.invalidate_user(target_user["username"])
 
     return {"message": f"User {user_id} has been unbanned successfully"}
@@ -1,6 +1,7 @@
-from fastapi import APIRouter, Query, HTTPException, status
+from fastapi import APIRouter, Query, HTTPException, status, Depends
 from typing import Optional, List, Dict, Any
 import db
+from auth.depends import get_current_user_id
 import logging
 
 logger = logging.getLogger(__name__)
@@ -10,7 +11,8 @@ router = APIRouter(tags=["Comments"])
 async def get_comments_for_product(
     product_id: int,
     sort_by: Optional[str] = Query("created_at", enum=["created_at", "rating"]),
-    order: Optional[str] = Query("desc", enum=["asc", "desc"])
+    order: Optional[str] = Query("desc", enum=["asc", "desc"]),
+    user_id: Optional[int] = Depends(get_current_user_id)
 ):
     if sort_by not in ["created_at", "rating"]:
         raise HTTPException(status_code=400, detail="Invalid sort_by parameter")
@@ -32,7 +34,9 @@ async def get_comments_for_product(
     """
 
     try:
-        async with db.pool.acquire() as conn:
+        # A user who just commented reads from the primary and sees their comment
+        read_pool = await db.get_read_pool_for_user(user_id)
+        async with read_pool.acquire() as conn:
             comments = await conn.fetch(query, product_id)
         return [dict(comment) for comment in comments]
 
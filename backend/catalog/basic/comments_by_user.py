@@ -13,7 +13,8 @@ async def get_comments_by_user(
     order: Optional[str] = Query("desc", regex="^(asc|desc)$")
 ):
     try:
-        async with db.pool.acquire() as conn:
+        read_pool = await db.get_read_pool_for_user(user_id)
+        async with read_pool.acquire() as conn:
             user = await conn.fetchrow(
                 'SELECT user_id, email, username FROM "Users" WHERE user_id = $1',
                 user_id
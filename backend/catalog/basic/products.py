@@ -1,15 +1,111 @@
 from fastapi import APIRouter, Query, HTTPException, Depends, status
-from typing import Optional, Annotated, Dict, Any
+from typing import Optional, Annotated, Dict, Any, List, Tuple
+from decimal import Decimal
 import db
 import logging
 from auth.depends import get_current_user
+from catalog.pagination import encode_cursor, decode_cursor
 
 router = APIRouter(tags=["Products"])
 
-redis_client = db.redis_client
 logger = logging.getLogger(__name__)
 
-CACHE_TTL_SECONDS = 300  
+IMAGE_BASE_URL = "http://localhost:9000/product-images/"
+NO_RATING = "нет оценок"
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+SORT_KEYS = {
+    "price_asc": ("price", "ASC"),
+    "price_desc": ("price", "DESC"),
+    "rating_asc": ("avg_rating", "ASC"),
+    "rating_desc": ("avg_rating", "DESC"),
+}
+# Sort columns that may be NULL; their NULL rows are paged as a tail after all others
+NULLABLE_SORT_COLUMNS = {"avg_rating"}
+
+
+def make_cursor(record, sort_key: str) -> str:
+    column, _ = SORT_KEYS.get(sort_key, (None, "ASC"))
+    value = record[column] if column else None
+    return encode_cursor({
+        "sort": sort_key,
+        "value": str(value) if value is not None else None,
+        "id": record["product_id"]
+    })
+
+
+def parse_cursor(cursor: str, sort_key: str) -> Dict[str, Any]:
+    try:
+        payload = decode_cursor(cursor)
+        if payload.get("sort") != sort_key:
+            raise ValueError("Cursor was issued for another sort order")
+        value = payload.get("value")
+        column, _ = SORT_KEYS.get(sort_key, (None, "ASC"))
+        if column is not None and value is None and column not in NULLABLE_SORT_COLUMNS:
+            raise ValueError("Cursor has no value for a NOT NULL sort column")
+        return {
+            "value": Decimal(value) if value is not None else None,
+            "id": int(payload["id"])
+        }
+    except (ValueError, TypeError, KeyError, ArithmeticError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def add_param(params: list, value, cast: str) -> str:
+    params.append(value)
+    return f'${len(params)}::{cast}'
+
+
+def keyset_segments(sort_key: str, after: Optional[Dict[str, Any]], params: list) -> List[Tuple[str, list]]:
+    """SQL suffixes (condition and ORDER BY) read one after another to fill a page.
+
+    Every segment is one row-value range over an index on (sort column,
+    product_id), ordered the way that index is scanned, so a page costs
+    O(limit) at any depth. A nullable sort column is paged as its non-NULL
+    range followed by its NULL tail; a cursor without a value points into the tail.
+    """
+    column, direction = SORT_KEYS.get(sort_key, (None, "ASC"))
+    op = '>' if direction == "ASC" else '<'
+
+    if column is None:
+        segment_params = list(params)
+        condition = f' AND p.product_id > {add_param(segment_params, after["id"], "int")}' if after else ''
+        return [(condition + ' ORDER BY p.product_id', segment_params)]
+
+    segments = []
+    in_null_tail = after is not None and after["value"] is None
+    if not in_null_tail:
+        segment_params = list(params)
+        condition = f' AND p.{column} IS NOT NULL' if column in NULLABLE_SORT_COLUMNS else ''
+        if after is not None:
+            value_param = add_param(segment_params, after["value"], "numeric")
+            id_param = add_param(segment_params, after["id"], "int")
+            condition += f' AND (p.{column}, p.product_id) {op} ({value_param}, {id_param})'
+        segments.append((
+            condition + f' ORDER BY p.{column} {direction}, p.product_id {direction}',
+            segment_params
+        ))
+    if column in NULLABLE_SORT_COLUMNS:
+        segment_params = list(params)
+        condition = f' AND p.{column} IS NULL'
+        if in_null_tail:
+            condition += f' AND p.product_id {op} {add_param(segment_params, after["id"], "int")}'
+        segments.append((condition + f' ORDER BY p.product_id {direction}', segment_params))
+    return segments
+
+
+async def fetch_main_images(conn, product_ids: List[int]) -> Dict[int, str]:
+    if not product_ids:
+        return {}
+    rows = await conn.fetch('''
+        SELECT DISTINCT ON (product_id) product_id, image_filename
+        FROM "Product_images"
+        WHERE product_id = ANY($1::int[]) AND image_filename IS NOT NULL
+        ORDER BY product_id, position ASC
+    ''', product_ids)
+    return {r["product_id"]: IMAGE_BASE_URL + r["image_filename"] for r in rows}
+
 
 @router.get("/products")
 async def get_products(
@@ -20,9 +116,14 @@ async def get_products(
     min_rating: Optional[float] = Query(None, ge=0, le=5),
     max_rating: Optional[float] = Query(None, ge=0, le=5),
     sort_by: Optional[str] = Query(None),
-    seller_id: Optional[int] = Query(None)
+    seller_id: Optional[int] = Query(None),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from next_cursor of the previous page")
 ):
     try:
+        sort_key = sort_by if sort_by in SORT_KEYS else "product_id"
+        after = parse_cursor(cursor, sort_key) if cursor else None
+
         query = '''
             SELECT
                 p.product_id,
@@ -35,11 +136,10 @@ async def get_products(
                 p.status,
                 p.in_stock,
                 p.status,
-                ROUND(AVG(c.rating)::numeric, 2) AS avg_rating
+                p.avg_rating
             FROM "Products" p
             JOIN "Sellers" s ON p.seller_id = s.seller_id
             JOIN "Users" u ON s.user_id = u.user_id
-            LEFT JOIN "Comments" c ON p.product_id = c.product_id
             WHERE TRUE
         '''
         params = []
@@ -61,77 +161,42 @@ async def get_products(
         if seller_id is not None:
             query += ' AND p.seller_id = $' + str(len(params) + 1)
             params.append(seller_id)
-
-        query += ' GROUP BY p.product_id, u.username'
-
-        if min_rating is not None and max_rating is not None:
-            query += ' HAVING AVG(c.rating) BETWEEN $' + str(len(params) + 1) + ' AND $' + str(len(params) + 2)
-            params.extend([min_rating, max_rating])
-        elif min_rating is not None:
-            query += ' HAVING AVG(c.rating) >= $' + str(len(params) + 1)
+        if min_rating is not None:
+            query += ' AND p.avg_rating >= $' + str(len(params) + 1)
             params.append(min_rating)
-        elif max_rating is not None:
-            query += ' HAVING AVG(c.rating) <= $' + str(len(params) + 1)
+        if max_rating is not None:
+            query += ' AND p.avg_rating <= $' + str(len(params) + 1)
             params.append(max_rating)
 
-        if sort_by == "price_asc":
-            query += ' ORDER BY p.price ASC'
-        elif sort_by == "price_desc":
-            query += ' ORDER BY p.price DESC'
-        elif sort_by == "rating_asc":
-            query += ' ORDER BY avg_rating ASC NULLS LAST'
-        elif sort_by == "rating_desc":
-            query += ' ORDER BY avg_rating DESC NULLS LAST'
-        else:
-            query += ' ORDER BY p.product_id'
-
-        async with db.pool.acquire() as conn:
-            records = await conn.fetch(query, *params)
-
-        async def get_cached_rating(product_id: int, db_rating) -> str:
-            cache_key = f"product:{product_id}:avg_rating"
-            cached = await redis_client.get(cache_key)
-            if cached is not None:
-                return cached
-            rating_str = str(db_rating) if db_rating is not None else "нет оценок"
-            if db_rating is not None:
-                await redis_client.set(cache_key, rating_str, ex=CACHE_TTL_SECONDS)
-            return rating_str
-
         products = []
 
-        async with db.pool.acquire() as conn:
-            records = await conn.fetch(query, *params)
-
-
-            for p in records:
-                avg_rating = await get_cached_rating(p["product_id"], p["avg_rating"])
-
-                image_record = await conn.fetchrow('''
-                        SELECT image_filename FROM "Product_images"
-                        WHERE product_id = $1
-                        ORDER BY position ASC
-                        LIMIT 1
-                    ''', p["product_id"])
-                main_image_url = (
-                    f"http://localhost:9000/product-images/{image_record['image_filename']}"
-                    if image_record and image_record["image_filename"]
-                    else None
-                )
-
-                products.append({
-                    "product_id": p["product_id"],
-                    "seller_id": p["seller_id"],
-                    "seller_name": p["seller_name"],
-                    "product_name": p["product_name"],
-                    "description": p["description"],
-                    "category": p["category"],
-                    "price": float(p["price"]),
-                    "in_stock": p["in_stock"],
-                    "status": p["status"],
-                    "avg_rating": avg_rating,
-                    "main_image_url": main_image_url
-                })
+        async with db.get_read_pool().acquire() as conn:
+            records = []
+            for suffix, segment_params in keyset_segments(sort_key, after, params):
+                segment_params.append(limit + 1 - len(records))
+                records += await conn.fetch(query + suffix + ' LIMIT $' + str(len(segment_params)), *segment_params)
+                if len(records) > limit:
+                    break
+            next_cursor = None
+            if len(records) > limit:
+                records = records[:limit]
+                next_cursor = make_cursor(records[-1], sort_key)
+            main_images = await fetch_main_images(conn, [p["product_id"] for p in records])
+
+        for p in records:
+            products.append({
+                "product_id": p["product_id"],
+                "seller_id": p["seller_id"],
+                "seller_name": p["seller_name"],
+                "product_name": p["product_name"],
+                "description": p["description"],
+                "category": p["category"],
+                "price": float(p["price"]),
+                "in_stock": p["in_stock"],
+                "status": p["status"],
+                "avg_rating": str(p["avg_rating"]) if p["avg_rating"] is not None else NO_RATING,
+                "main_image_url": main_images.get(p["product_id"])
+            })
 
         return {
             "count": len(products),
@@ -145,8 +210,12 @@ async def get_products(
                 "sort_by": sort_by,
                 "seller_id": seller_id
             },
+            "limit": limit,
+            "next_cursor": next_cursor,
             "products": products
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal error: {e}")
@@ -11,7 +11,7 @@ async def get_sellers(
     sort_by: str | None = Query(None, enum=["rating", "sales"], description="Сортировка: rating или sales")
 ):
     try:
-        async with db.pool.acquire() as conn:
+        async with db.get_read_pool().acquire() as conn:
             base_query = '''
                 SELECT 
                     s.seller_id,
@@ -45,7 +45,7 @@ async def get_sellers(
 @router.get("/categories/")
 async def get_categories():
     try:
-        async with db.pool.acquire() as conn:
+        async with db.get_read_pool().acquire() as conn:
             rows = await conn.fetch('SELECT DISTINCT category FROM "Products" ORDER BY category')
             categories = [row["category"] for row in rows]
             return categories
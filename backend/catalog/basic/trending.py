@@ -0,0 +1,119 @@
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Tuple
+import logging
+import os
+import time
+from fastapi import APIRouter, HTTPException, Query
+from redis.exceptions import RedisError
+import db
+
+logger = logging.getLogger(__name__)
+router = APIRouter(tags=["Products"])
+
+TRENDING_MAX_WINDOW_MINUTES = int(os.getenv("TRENDING_MAX_WINDOW_MINUTES", "60"))
+# How long a merged window is served before it is rebuilt from the minute buckets
+TRENDING_WINDOW_CACHE_SECONDS = int(os.getenv("TRENDING_WINDOW_CACHE_SECONDS", "10"))
+TRENDING_VIEW_WEIGHT = 1.0
+TRENDING_CART_WEIGHT = float(os.getenv("TRENDING_CART_WEIGHT", "5"))
+
+def _minute(timestamp: float) -> int:
+    return int(timestamp // 60)
+
+def trending_bucket_key(minute: int) -> str:
+    return f"trending:bucket:{minute}"
+
+def trending_window_key(window_minutes: int) -> str:
+    return f"trending:window:{window_minutes}"
+
+async def record_product_events(events: Iterable[Tuple[int, int]], weight: float):
+    """Add weight per (minute, product_id) event to the per-minute buckets."""
+    counts = Counter(events)
+    if not counts:
+        return
+    try:
+        async with db.redis_client.pipeline(transaction=False) as pipe:
+            minutes = set()
+            for (minute, product_id), count in counts.items():
+                pipe.zincrby(trending_bucket_key(minute), count * weight, str(product_id))
+                minutes.add(minute)
+            for minute in minutes:
+                # A bucket is only read while it is inside the largest window
+                pipe.expireat(trending_bucket_key(minute), (minute + TRENDING_MAX_WINDOW_MINUTES + 2) * 60)
+            await pipe.execute()
+    except RedisError as e:
+        logger.error(f"Redis error while recording trending events: {e}")
+
+async def record_views(views: Iterable[Tuple[Any, int, datetime]]):
+    """Count a flushed batch of (user_id, product_id, viewed_at) views."""
+    await record_product_events(
+        ((_minute(viewed_at.replace(tzinfo=timezone.utc).timestamp()), product_id)
+         for _, product_id, viewed_at in views),
+        TRENDING_VIEW_WEIGHT
+    )
+
+async def record_cart_add(product_id: int):
+    await record_product_events([(_minute(time.time()), product_id)], TRENDING_CART_WEIGHT)
+
+async def get_trending_scores(window_minutes: int, limit: int) -> List[Tuple[str, float]]:
+    """Top products over the last window_minutes, newer minutes weighing more.
+
+    The minute buckets are merged with ZUNIONSTORE into a window key that is
+    reused for a few seconds, so a request is one ZREVRANGE on the merged set.
+    """
+    window_key = trending_window_key(window_minutes)
+    if not await db.redis_client.exists(window_key):
+        current = _minute(time.time())
+        # Linear decay: the current minute counts fully, the oldest one barely
+        weights = {
+            trending_bucket_key(current - age): (window_minutes - age) / window_minutes
+            for age in range(window_minutes)
+        }
+        async with db.redis_client.pipeline(transaction=True) as pipe:
+            pipe.zunionstore(window_key, weights)
+            pipe.expire(window_key, TRENDING_WINDOW_CACHE_SECONDS)
+            await pipe.execute()
+    return await db.redis_client.zrevrange(window_key, 0, limit - 1, withscores=True)
+
+@router.get("/trending", description="Products with the most views and cart additions right now")
+async def get_trending(
+    limit: int = Query(10, ge=1, le=50, description="Number of products"),
+    window_minutes: int = Query(15, ge=1, le=TRENDING_MAX_WINDOW_MINUTES, description="Window in minutes")
+) -> List[Dict[str, Any]]:
+    try:
+        scores = await get_trending_scores(window_minutes, limit)
+        if not scores:
+            return []
+
+        async with db.get_read_pool().acquire() as conn:
+            rows = await conn.fetch(
+                '''
+                SELECT p.product_id, p.product_name, p.category, p.price, p.avg_rating, p.in_stock
+                FROM "Products" p
+                WHERE p.product_id = ANY($1::int[]) AND p.status = 'available'
+                ''',
+                [int(product_id) for product_id, _ in scores]
+            )
+        products = {row["product_id"]: row for row in rows}
+
+        trending = []
+        for product_id, score in scores:
+            row = products.get(int(product_id))
+            if row is None:
+                continue
+            trending.append({
+                "product_id": row["product_id"],
+                "product_name": row["product_name"],
+                "category": row["category"],
+                "price": float(row["price"]),
+                "avg_rating": float(row["avg_rating"]) if row["avg_rating"] is not None else None,
+                "in_stock": row["in_stock"],
+                "score": round(score, 2)
+            })
+        return trending
+
+    except RedisError as e:
+        logger.error(f"Redis error while reading trending products: {e}")
+        raise HTTPException(status_code=503, detail="Trending is temporarily unavailable")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
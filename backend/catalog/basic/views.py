@@ -0,0 +1,97 @@
+from collections import deque
+from datetime import datetime
+from typing import Deque, List, Optional, Tuple
+import asyncio
+import logging
+import os
+import asyncpg
+import db
+from catalog.basic.trending import record_views
+
+logger = logging.getLogger(__name__)
+
+VIEW_FLUSH_INTERVAL_SECONDS = float(os.getenv("VIEW_FLUSH_INTERVAL_SECONDS", "1"))
+VIEW_FLUSH_BATCH_SIZE = int(os.getenv("VIEW_FLUSH_BATCH_SIZE", "5000"))
+# Past this many unflushed views new ones are dropped instead of growing memory
+VIEW_BUFFER_MAX_SIZE = int(os.getenv("VIEW_BUFFER_MAX_SIZE", "100000"))
+
+ViewRecord = Tuple[Optional[int], int, datetime]
+
+_view_buffer: Deque[ViewRecord] = deque()
+_flush_wanted = asyncio.Event()
+_flush_lock = asyncio.Lock()
+_view_stats = {"recorded": 0, "dropped": 0, "flushed": 0, "flushes": 0, "flush_errors": 0}
+
+def view_buffer_stats() -> dict:
+    return {
+        **_view_stats,
+        "buffered": len(_view_buffer),
+        "max_size": VIEW_BUFFER_MAX_SIZE,
+    }
+
+def record_view(user_id: Optional[int], product_id: int):
+    """Queue a product view; it reaches Product_views on the next flush."""
+    if len(_view_buffer) >= VIEW_BUFFER_MAX_SIZE:
+        _view_stats["dropped"] += 1
+        return
+    _view_buffer.append((user_id, product_id, datetime.utcnow()))
+    _view_stats["recorded"] += 1
+    if len(_view_buffer) >= VIEW_FLUSH_BATCH_SIZE:
+        _flush_wanted.set()
+
+async def _write_views(batch: List[ViewRecord]):
+    async with db.pool.acquire() as conn:
+        try:
+            await conn.copy_records_to_table(
+                "Product_views",
+                records=batch,
+                columns=["user_id", "product_id", "viewed_at"]
+            )
+        except asyncpg.ForeignKeyViolationError:
+            # COPY is all or nothing; a product or user deleted since the view
+            # must not cost the whole batch
+            await conn.execute(
+                '''
+                INSERT INTO "Product_views"(user_id, product_id, viewed_at)
+                SELECT u.user_id, v.product_id, v.viewed_at
+                FROM unnest($1::int[], $2::int[], $3::timestamp[]) AS v(user_id, product_id, viewed_at)
+                JOIN "Products" p ON p.product_id = v.product_id
+                LEFT JOIN "Users" u ON u.user_id = v.user_id
+                ''',
+                [record[0] for record in batch],
+                [record[1] for record in batch],
+                [record[2] for record in batch]
+            )
+
+async def flush_views() -> int:
+    """Write everything buffered so far; returns how many views were written."""
+    flushed = 0
+    async with _flush_lock:
+        _flush_wanted.clear()
+        while _view_buffer:
+            batch = [_view_buffer.popleft() for _ in range(min(len(_view_buffer), VIEW_FLUSH_BATCH_SIZE))]
+            try:
+                await _write_views(batch)
+            except Exception as e:
+                _view_stats["flush_errors"] += 1
+                logger.error(f"Failed to flush {len(batch)} product views: {e}")
+                # Put the batch back for the next attempt as far as the bound allows
+                room = VIEW_BUFFER_MAX_SIZE - len(_view_buffer)
+                _view_stats["dropped"] += max(0, len(batch) - room)
+                _view_buffer.extendleft(reversed(batch[:max(0, room)]))
+                break
+            flushed += len(batch)
+            _view_stats["flushed"] += len(batch)
+            _view_stats["flushes"] += 1
+            await record_views(batch)
+    return flushed
+
+async def run_view_flusher():
+    """Background loop draining the view buffer every interval or once a batch fills up."""
+    while True:
+        try:
+            await asyncio.wait_for(_flush_wanted.wait(), timeout=VIEW_FLUSH_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        # Shielded so a shutdown does not lose the batch that is being written
+        await asyncio.shield(flush_views())
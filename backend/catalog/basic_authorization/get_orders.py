@@ -63,7 +63,8 @@ async def get_orders(
 
     where_clause = ' AND '.join(filters)
 
-    async with db.pool.acquire() as conn:
+    read_pool = await db.get_read_pool_for_user(target_user_id)
+    async with read_pool.acquire() as conn:
         orders = await conn.fetch(f'''
             SELECT order_id, status, total_price, created_at
             FROM "Orders"
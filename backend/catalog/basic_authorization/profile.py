@@ -70,4 +70,5 @@ async def update_profile(
                     user_id, new_description
                 )
 
+    await db.invalidate_user(current_user.get("username"), new_username)
     return {"message": "Profile updated successfully"}
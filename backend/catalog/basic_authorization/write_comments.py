@@ -26,6 +26,7 @@ async def create_comment(
     if db.pool is None:
         raise HTTPException(status_code=500, detail="DB pool not initialized")
 
+    await db.mark_recent_write(current_user["user_id"])
     async with db.pool.acquire() as conn:
         product = await conn.fetchrow('SELECT product_id FROM "Products" WHERE product_id = $1', comment.product_id)
         if not product:
@@ -66,6 +67,7 @@ async def update_comment(
     data: CommentUpdate,
     current_user: Annotated[dict, Depends(get_current_user)]
 ):
+    await db.mark_recent_write(current_user["user_id"])
     async with db.pool.acquire() as conn:
         comment = await conn.fetchrow('SELECT * FROM "Comments" WHERE comment_id = $1', comment_id)
         if not comment:
@@ -87,6 +89,7 @@ async def delete_comment(
     comment_id: int,
     current_user: Annotated[dict, Depends(get_current_user)]
 ):
+    await db.mark_recent_write(current_user["user_id"])
     async with db.pool.acquire() as conn:
         comment = await conn.fetchrow('SELECT * FROM "Comments" WHERE comment_id = $1', comment_id)
         if not comment:
@@ -3,6 +3,7 @@ from typing import Annotated, List, Dict, Any
 import logging
 import db
 from auth.depends import get_current_user
+from catalog.basic.trending import record_cart_add
 
 logger = logging.getLogger(__name__)
 router = APIRouter(
@@ -12,7 +13,8 @@ router = APIRouter(
 
 @router.get("/")
 async def get_cart(current_user: Annotated[dict, Depends(get_current_user)]):
-    async with db.pool.acquire() as conn:
+    read_pool = await db.get_read_pool_for_user(current_user["user_id"])
+    async with read_pool.acquire() as conn:
         basket = await conn.fetchrow(
             'SELECT basket_id FROM "Baskets" WHERE user_id = $1',
             current_user["user_id"]
@@ -41,6 +43,7 @@ async def add_to_cart(
     if quantity <= 0:
         raise HTTPException(status_code=400, detail="Quantity must be greater than 0")
 
+    await db.mark_recent_write(current_user["user_id"])
     async with db.pool.acquire() as conn:
         async with conn.transaction():
             basket = await conn.fetchrow(
@@ -88,7 +91,8 @@ async def add_to_cart(
                 current_user["user_id"], product_id, quantity
             )
 
-            return {"detail": "Product added to cart"}
+    await record_cart_add(product_id)
+    return {"detail": "Product added to cart"}
 
 
 @router.delete("/remove")
@@ -96,6 +100,7 @@ async def remove_from_cart(
     product_id: int,
     current_user: Annotated[dict, Depends(get_current_user)]
 ):
+    await db.mark_recent_write(current_user["user_id"])
     async with db.pool.acquire() as conn:
         basket = await conn.fetchrow(
             'SELECT basket_id FROM "Baskets" WHERE user_id = $1',
@@ -130,6 +135,7 @@ async def increase_quantity(
     if quantity <= 0:
         raise HTTPException(status_code=400, detail="Quantity must be greater than 0")
 
+    await db.mark_recent_write(current_user["user_id"])
     async with db.pool.acquire() as conn:
         async with conn.transaction():
             basket = await conn.fetchrow(
@@ -169,7 +175,8 @@ async def increase_quantity(
                 current_user["user_id"], product_id, quantity
             )
 
-            return {"detail": f"Quantity increased by {quantity}"}
+    await record_cart_add(product_id)
+    return {"detail": f"Quantity increased by {quantity}"}
         
 @router.patch("/decrease")
 async def decrease_quantity(
@@ -180,6 +187,7 @@ async def decrease_quantity(
     if quantity <= 0:
         raise HTTPException(status_code=400, detail="Quantity must be greater than 0")
 
+    await db.mark_recent_write(current_user["user_id"])
     async with db.pool.acquire() as conn:
         async with conn.transaction():
             basket = await conn.fetchrow(
@@ -13,6 +13,7 @@ async def purchase_items(current_user: Annotated[dict, Depends(get_current_user)
     if current_user["role"] != "user":
         raise HTTPException(status_code=403, detail="Only users can make purchases")
 
+    await db.mark_recent_write(current_user["user_id"])
     async with db.pool.acquire() as conn:
         async with conn.transaction():
             basket = await conn.fetchrow(
@@ -10,22 +10,51 @@ async def search_products(
     category_id: Optional[str] = Query(None, description="Filter by category ID"),
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(20, ge=1, le=100, description="Items per page"),
+    use_cursor: bool = Query(False, description="Start cursor pagination (search_after) instead of page numbers"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous response"),
+    seller_id: Optional[str] = Query(None, description="Filter by seller ID"),
+    min_price: Optional[float] = Query(None, ge=0, description="Minimum price"),
+    max_price: Optional[float] = Query(None, ge=0, description="Maximum price"),
+    min_rating: Optional[float] = Query(None, ge=0, le=5, description="Minimum average rating"),
+    facets: bool = Query(False, description="Also return category, seller, price and rating facets"),
     search_service: SearchService = Depends(lambda: SearchService())
 ) -> Dict[str, Any]:
+    if use_cursor or cursor:
+        try:
+            return await search_service.search_products_after(
+                query=q,
+                category_id=category_id,
+                page_size=page_size,
+                cursor=cursor,
+                seller_id=seller_id,
+                min_price=min_price,
+                max_price=max_price,
+                min_rating=min_rating,
+                facets=facets
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
     return await search_service.search_products(
         query=q,
         category_id=category_id,
         page=page,
-        page_size=page_size
+        page_size=page_size,
+        seller_id=seller_id,
+        min_price=min_price,
+        max_price=max_price,
+        min_rating=min_rating,
+        facets=facets
     )
 
 @router.get("/suggest")
 async def suggest_products(
     q: str = Query(..., min_length=1, description="Prefix to get suggestions for"),
     limit: int = Query(5, ge=1, le=20, description="Maximum number of suggestions"),
+    category: Optional[str] = Query(None, description="Only suggest products from this category"),
     search_service: SearchService = Depends(lambda: SearchService())
 ) -> List[Dict[str, str]]:
-    return await search_service.suggest_products(prefix=q, limit=limit)
+    return await search_service.suggest_products(prefix=q, limit=limit, category=category)
 
 @router.get("/similar/{product_id}")
 async def get_similar_products(
@@ -1,20 +1,64 @@
 from typing import List, Dict, Any, Optional
+import hashlib
+import json
+import logging
+import os
 from elasticsearch.exceptions import NotFoundError
+from redis.exceptions import RedisError
+import db
+from catalog.pagination import encode_cursor, decode_cursor
 from elastic.client import get_elasticsearch_client
 from elastic.mappings import PRODUCT_INDEX_NAME
+from elastic.sync import SEARCH_GENERATION_KEY
+from catalog.search.similar import (
+    compute_similar_products,
+    get_cached_similar_products,
+    store_similar_products,
+)
+
+logger = logging.getLogger(__name__)
+
+SEARCH_CACHE_TTL_SECONDS = int(os.getenv("SEARCH_CACHE_TTL_SECONDS", "30"))
+# How long a point-in-time stays open between two cursor requests
+SEARCH_PIT_KEEP_ALIVE = os.getenv("SEARCH_PIT_KEEP_ALIVE", "2m")
+
+SEARCH_SORT = [
+    {"_score": "desc"},
+    {"avg_rating": {"order": "desc", "missing": "_last"}},
+    {"price": "asc"}
+]
+
+SEARCH_FACET_SIZE = int(os.getenv("SEARCH_FACET_SIZE", "20"))
+SEARCH_PRICE_INTERVAL = float(os.getenv("SEARCH_PRICE_INTERVAL", "1000"))
+# "N+" rating buckets, from the best down
+SEARCH_RATING_BUCKETS = [4, 3, 2, 1]
+
+_search_cache_stats = {"hits": 0, "misses": 0, "errors": 0}
+
+def search_cache_stats() -> dict:
+    lookups = _search_cache_stats["hits"] + _search_cache_stats["misses"]
+    return {
+        **_search_cache_stats,
+        "hit_rate": round(_search_cache_stats["hits"] / lookups, 4) if lookups else 0.0,
+        "es_queries_saved": _search_cache_stats["hits"],
+        "ttl_seconds": SEARCH_CACHE_TTL_SECONDS,
+    }
+
+def search_fingerprint(query: str, category_id: Optional[str], *extra) -> str:
+    normalized = " ".join(query.lower().split())
+    return hashlib.sha1(
+        json.dumps([normalized, category_id, *extra], ensure_ascii=False).encode()
+    ).hexdigest()
+
+def search_cache_key(generation: str, query: str, category_id: Optional[str], *extra) -> str:
+    return f"search:{generation}:{search_fingerprint(query, category_id, *extra)}"
 
 class SearchService:
     def __init__(self):
         self.es_client = get_elasticsearch_client()
 
-    async def search_products(
-        self,
-        query: str,
-        category_id: Optional[str] = None,
-        page: int = 1,
-        page_size: int = 20
-    ) -> Dict[str, Any]:
-        must_conditions = [{
+    def _search_query(self, query: str) -> Dict[str, Any]:
+        return {
             "multi_match": {
                 "query": query,
                 "fields": [
@@ -26,172 +70,299 @@ class SearchService:
                 "fuzziness": "AUTO",
                 "operator": "or"  # Changed from 'and' to 'or'
             }
-        }]
+        }
 
+    def _search_filters(
+        self,
+        category_id: Optional[str] = None,
+        seller_id: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        min_rating: Optional[float] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """Filter clauses keyed by the facet they belong to."""
+        filters = {}
         if category_id:
-            must_conditions.append({"term": {"category.keyword": category_id}})
+            filters["category"] = {"term": {"category.keyword": category_id}}
+        if seller_id:
+            filters["seller"] = {"term": {"seller_id": seller_id}}
+        if min_price is not None or max_price is not None:
+            price_range = {}
+            if min_price is not None:
+                price_range["gte"] = min_price
+            if max_price is not None:
+                price_range["lte"] = max_price
+            filters["price"] = {"range": {"price": price_range}}
+        if min_rating is not None:
+            filters["rating"] = {"range": {"avg_rating": {"gte": min_rating}}}
+        return filters
 
-        body = {
-            "query": {"bool": {"must": must_conditions}},
-            "from": (page - 1) * page_size,
-            "size": page_size,
-            "sort": [
-                {"_score": "desc"},
-                {"avg_rating": {"order": "desc", "missing": "_last"}},
-                {"price": "asc"}
+    def _facet_aggs(self, filters: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """One filter agg per facet holding every filter except its own.
+
+        The filters themselves go to post_filter, so each facet still shows
+        the counts a user would get by changing only that dimension.
+        """
+        facets = {
+            "category": {"terms": {"field": "category.keyword", "size": SEARCH_FACET_SIZE}},
+            "seller": {
+                "terms": {"field": "seller_id", "size": SEARCH_FACET_SIZE},
+                "aggs": {"name": {"terms": {"field": "seller_name.keyword", "size": 1}}}
+            },
+            "price": {"histogram": {"field": "price", "interval": SEARCH_PRICE_INTERVAL, "min_doc_count": 1}},
+            "rating": {
+                "range": {
+                    "field": "avg_rating",
+                    "keyed": True,
+                    "ranges": [{"key": f"{rating}+", "from": rating} for rating in SEARCH_RATING_BUCKETS]
+                }
+            }
+        }
+
+        aggs = {}
+        for name, agg in facets.items():
+            others = [clause for facet, clause in filters.items() if facet != name]
+            aggs[name] = {
+                "filter": {"bool": {"filter": others}} if others else {"match_all": {}},
+                "aggs": {"values": agg}
+            }
+        return aggs
+
+    def _parse_facets(self, aggregations: Dict[str, Any]) -> Dict[str, Any]:
+        sellers = []
+        for bucket in aggregations["seller"]["values"]["buckets"]:
+            names = bucket["name"]["buckets"]
+            sellers.append({
+                "seller_id": bucket["key"],
+                "seller_name": names[0]["key"] if names else None,
+                "count": bucket["doc_count"]
+            })
+
+        rating_buckets = aggregations["rating"]["values"]["buckets"]
+        return {
+            "category": [
+                {"value": bucket["key"], "count": bucket["doc_count"]}
+                for bucket in aggregations["category"]["values"]["buckets"]
+            ],
+            "seller": sellers,
+            "price": [
+                {"from": bucket["key"], "to": bucket["key"] + SEARCH_PRICE_INTERVAL, "count": bucket["doc_count"]}
+                for bucket in aggregations["price"]["values"]["buckets"]
+            ],
+            "rating": [
+                {"min_rating": rating, "count": rating_buckets[f"{rating}+"]["doc_count"]}
+                for rating in SEARCH_RATING_BUCKETS
             ]
         }
 
+    def _search_body(
+        self,
+        query: str,
+        filters: Dict[str, Dict[str, Any]],
+        facets: bool
+    ) -> Dict[str, Any]:
+        body = {
+            "_source": {"excludes": ["product_suggest"]},
+            "sort": SEARCH_SORT
+        }
+        if facets:
+            # Aggregations run on the unfiltered matches; hits are narrowed afterwards
+            body["query"] = self._search_query(query)
+            body["aggs"] = self._facet_aggs(filters)
+            if filters:
+                body["post_filter"] = {"bool": {"filter": list(filters.values())}}
+        elif filters:
+            body["query"] = {"bool": {"must": [self._search_query(query)], "filter": list(filters.values())}}
+        else:
+            body["query"] = self._search_query(query)
+        return body
+
+    async def search_products(
+        self,
+        query: str,
+        category_id: Optional[str] = None,
+        page: int = 1,
+        page_size: int = 20,
+        seller_id: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        min_rating: Optional[float] = None,
+        facets: bool = False
+    ) -> Dict[str, Any]:
+        cache_key = None
+        try:
+            generation = await db.redis_client.get(SEARCH_GENERATION_KEY) or "0"
+            cache_key = search_cache_key(
+                generation, query, category_id, page, page_size,
+                seller_id, min_price, max_price, min_rating, facets
+            )
+            cached = await db.redis_client.get(cache_key)
+            if cached:
+                _search_cache_stats["hits"] += 1
+                return json.loads(cached)
+        except RedisError as e:
+            _search_cache_stats["errors"] += 1
+            logger.error(f"Redis error while reading search cache: {e}")
+        _search_cache_stats["misses"] += 1
+
+        filters = self._search_filters(category_id, seller_id, min_price, max_price, min_rating)
+        body = self._search_body(query, filters, facets)
+        body["from"] = (page - 1) * page_size
+        body["size"] = page_size
+
         response = await self.es_client.get_client().search(
             index=PRODUCT_INDEX_NAME,
             body=body
         )
 
-        return {
+        result = {
             "total": response["hits"]["total"]["value"],
             "items": [hit["_source"] for hit in response["hits"]["hits"]]
         }
+        if facets:
+            result["facets"] = self._parse_facets(response["aggregations"])
 
-    async def suggest_products(self, prefix: str, limit: int = 5) -> List[Dict[str, Any]]:
-        body = {
+        if cache_key is not None:
+            try:
+                await db.redis_client.set(cache_key, json.dumps(result, ensure_ascii=False), ex=SEARCH_CACHE_TTL_SECONDS)
+            except RedisError as e:
+                _search_cache_stats["errors"] += 1
+                logger.error(f"Redis error while writing search cache: {e}")
+        return result
+
+    async def search_products_after(
+        self,
+        query: str,
+        category_id: Optional[str] = None,
+        page_size: int = 20,
+        cursor: Optional[str] = None,
+        seller_id: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        min_rating: Optional[float] = None,
+        facets: bool = False
+    ) -> Dict[str, Any]:
+        """Cursor pagination with search_after over a point-in-time snapshot.
+
+        Every page costs the same however deep it is, and the 10k from/size
+        window does not apply. The cursor is bound to the query, filters and
+        page size; it raises ValueError when it is malformed, belongs to
+        another query or its point-in-time has expired. Facets, like the
+        total, only come with the first page.
+        """
+        client = self.es_client.get_client()
+        fingerprint = search_fingerprint(query, category_id, page_size, seller_id, min_price, max_price, min_rating)
+
+        if cursor:
+            state = decode_cursor(cursor)
+            if state.get("q") != fingerprint or not state.get("pit") or not isinstance(state.get("after"), list):
+                raise ValueError("Cursor does not match this search")
+            pit_id, search_after = state["pit"], state["after"]
+        else:
+            pit = await client.open_point_in_time(index=PRODUCT_INDEX_NAME, keep_alive=SEARCH_PIT_KEEP_ALIVE)
+            pit_id, search_after = pit["id"], None
+
+        filters = self._search_filters(category_id, seller_id, min_price, max_price, min_rating)
+        body = self._search_body(query, filters, facets and search_after is None)
+        body.update({
+            "size": page_size,
+            "pit": {"id": pit_id, "keep_alive": SEARCH_PIT_KEEP_ALIVE},
+            # Counting every match again on each page would undo the constant cost
+            "track_total_hits": search_after is None
+        })
+        if search_after is not None:
+            body["search_after"] = search_after
+
+        try:
+            response = await client.search(body=body)
+        except NotFoundError:
+            raise ValueError("Cursor has expired")
+
+        hits = response["hits"]["hits"]
+        pit_id = response.get("pit_id", pit_id)
+        next_cursor = None
+        if len(hits) == page_size:
+            next_cursor = encode_cursor({"q": fingerprint, "pit": pit_id, "after": hits[-1]["sort"]})
+        else:
+            await client.close_point_in_time(id=pit_id)
+
+        result = {
+            "items": [hit["_source"] for hit in hits],
+            "next_cursor": next_cursor
+        }
+        if search_after is None:
+            result["total"] = response["hits"]["total"]["value"]
+            if facets:
+                result["facets"] = self._parse_facets(response["aggregations"])
+        return result
+
+    def _suggest_body(self, prefix: str, limit: int, category: Optional[str], fuzzy: bool) -> Dict[str, Any]:
+        completion = {
+            "field": "product_suggest",
             "size": limit,
+            "skip_duplicates": True,
+            "contexts": {"status": ["available"]}
+        }
+        if category:
+            completion["contexts"]["category"] = [category]
+        if fuzzy:
+            completion["fuzzy"] = {"fuzziness": "AUTO", "prefix_length": 1}
+        return {
             "_source": ["product_id", "product_name", "category", "price"],
-            "query": {
-                "bool": {
-                    "should": [
-                        {
-                            "match_phrase_prefix": {
-                                "product_name": {
-                                    "query": prefix,
-                                    "boost": 10
-                                }
-                            }
-                        },
-                        {
-                            "match": {
-                                "product_name": {
-                                    "query": prefix,
-                                    "fuzziness": "AUTO",
-                                    "boost": 5
-                                }
-                            }
-                        },
-                        {
-                            "wildcard": {
-                                "product_name": {
-                                    "value": f"*{prefix}*",
-                                    "boost": 2
-                                }
-                            }
-                        },
-                        {
-                            "match": {
-                                "product_name": {
-                                    "query": prefix,
-                                    "fuzziness": 2,
-                                    "prefix_length": 1
-                                }
-                            }
-                        }
-                    ],
-                    "minimum_should_match": 1,
-                    "filter": [
-                        {"term": {"status": "available"}},
-                        {"range": {"in_stock": {"gt": 0}}}
-                    ]
-                }
-            },
-            "sort": [
-                {"_score": "desc"},
-                {"avg_rating": {"order": "desc", "missing": "_last"}},
-                {"price": "asc"}
-            ]
+            "suggest": {
+                "products": {"prefix": prefix, "completion": completion}
+            }
         }
 
-        response = await self.es_client.get_client().search(
+    async def suggest_products(self, prefix: str, limit: int = 5, category: Optional[str] = None) -> List[Dict[str, Any]]:
+        client = self.es_client.get_client()
+        response = await client.search(
             index=PRODUCT_INDEX_NAME,
-            body=body
+            body=self._suggest_body(prefix, limit, category, fuzzy=False)
         )
+        options = response["suggest"]["products"][0]["options"]
+
+        # Typo tolerance only when the exact prefix finds nothing
+        if not options:
+            response = await client.search(
+                index=PRODUCT_INDEX_NAME,
+                body=self._suggest_body(prefix, limit, category, fuzzy=True)
+            )
+            options = response["suggest"]["products"][0]["options"]
 
         return [{
-            "id": hit["_source"]["product_id"],
-            "name": hit["_source"]["product_name"],
-            "category": hit["_source"]["category"],
-            "price": str(hit["_source"]["price"])
-        } for hit in response["hits"]["hits"]]
+            "id": option["_source"]["product_id"],
+            "name": option["_source"]["product_name"],
+            "category": option["_source"]["category"],
+            "price": str(option["_source"]["price"])
+        } for option in options]
 
     async def get_similar_products(self, product_id: str, limit: int = 5) -> List[Dict[str, Any]]:
-        try:
-            product = await self.es_client.get_client().get(
-                index=PRODUCT_INDEX_NAME,
-                id=product_id
-            )
-            source = product["_source"]
-
-            body = {
-                "query": {
-                    "bool": {
-                        "should": [
-                            {
-                                "term": {
-                                    "category.keyword": {
-                                        "value": source["category"],
-                                        "boost": 4.0
-                                    }
-                                }
-                            },
-                            {
-                                "term": {
-                                    "seller_id": {
-                                        "value": source["seller_id"],
-                                        "boost": 2.0
-                                    }
-                                }
-                            },
-                            {
-                                "range": {
-                                    "price": {
-                                        "gte": float(source["price"]) * 0.7,
-                                        "lte": float(source["price"]) * 1.3,
-                                        "boost": 1.5
-                                    }
-                                }
-                            },
-                            {
-                                "more_like_this": {
-                                    "fields": ["product_name", "description"],
-                                    "like": source["description"],
-                                    "min_term_freq": 1,
-                                    "max_query_terms": 12,
-                                    "minimum_should_match": "30%",
-                                    "boost": 1.0
-                                }
-                            }
-                        ],
-                        "must_not": [
-                            {"term": {"product_id": product_id}}
-                        ],
-                        "filter": [
-                            {"term": {"status": "available"}},
-                            {"range": {"in_stock": {"gt": 0}}}
-                        ],
-                        "minimum_should_match": 1
-                    }
-                },
-                "size": limit,
-                "_source": True,
-                "sort": [
-                    {"_score": "desc"},
-                    {"avg_rating": {"order": "desc", "missing": "_last"}},
-                    {"price": "asc"}
-                ]
-            }
+        """Similar products from the precomputed list, computed on the spot on a miss.
 
-            response = await self.es_client.get_client().search(
-                index=PRODUCT_INDEX_NAME,
-                body=body
-            )
+        The list only holds ids; the documents are fetched by id so price,
+        stock and status are always current. It keeps SIMILAR_PRODUCTS_TOP_N
+        candidates, so the page is cut to limit only after unavailable ones
+        are dropped.
+        """
+        client = self.es_client.get_client()
+        similar_ids = await get_cached_similar_products(product_id)
+        if similar_ids is None:
+            similar_ids = await compute_similar_products(client, product_id)
+            if similar_ids is None:
+                return None
+            await store_similar_products(product_id, similar_ids)
+        if not similar_ids:
+            return []
 
-            return [hit["_source"] for hit in response["hits"]["hits"]]
-        except NotFoundError:
-            return None  
+        response = await client.mget(
+            index=PRODUCT_INDEX_NAME,
+            ids=similar_ids,
+            _source_excludes=["product_suggest"]
+        )
+        products = [
+            doc["_source"] for doc in response["docs"]
+            if doc.get("found") and doc["_source"].get("status") == "available"
+            and (doc["_source"].get("in_stock") or 0) > 0
+        ]
+        return products[:limit]
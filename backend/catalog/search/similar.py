@@ -0,0 +1,235 @@
+from typing import Dict, Any, List, Optional, Set
+import asyncio
+import json
+import logging
+import os
+from elasticsearch.exceptions import NotFoundError
+from redis.exceptions import RedisError
+import db
+from elastic.client import get_elasticsearch_client
+from elastic.mappings import PRODUCT_INDEX_NAME, get_live_index
+from elastic.sync import SIMILAR_DIRTY_KEY
+
+logger = logging.getLogger(__name__)
+
+# Candidates stored per product: well above the largest /similar page (20), so a
+# page stays full after candidates that went out of stock are filtered out
+SIMILAR_PRODUCTS_TOP_N = int(os.getenv("SIMILAR_PRODUCTS_TOP_N", "50"))
+SIMILAR_PRODUCTS_CONCURRENCY = int(os.getenv("SIMILAR_PRODUCTS_CONCURRENCY", "4"))
+SIMILAR_REFRESH_INTERVAL_SECONDS = float(os.getenv("SIMILAR_REFRESH_INTERVAL_SECONDS", "5"))
+SIMILAR_REFRESH_BATCH = 100
+# How often every list is recomputed, which also picks up products that became similar
+SIMILAR_FULL_REFRESH_SECONDS = int(os.getenv("SIMILAR_FULL_REFRESH_SECONDS", "21600"))
+SIMILAR_PRODUCTS_TTL_SECONDS = SIMILAR_FULL_REFRESH_SECONDS * 4
+SIMILAR_FULL_REFRESH_KEY = "similar_products:full_refresh"
+
+_similar_stats = {"hits": 0, "misses": 0, "computed": 0, "errors": 0}
+
+def similar_products_stats() -> dict:
+    lookups = _similar_stats["hits"] + _similar_stats["misses"]
+    return {
+        **_similar_stats,
+        "hit_rate": round(_similar_stats["hits"] / lookups, 4) if lookups else 0.0,
+        "top_n": SIMILAR_PRODUCTS_TOP_N,
+    }
+
+def similar_products_key(product_id) -> str:
+    return f"similar_products:{product_id}"
+
+def similar_refs_key(product_id) -> str:
+    """Products whose stored list contains product_id, recomputed when it changes."""
+    return f"similar_products:refs:{product_id}"
+
+def similar_products_query(source: Dict[str, Any], product_id: str, size: int) -> Dict[str, Any]:
+    return {
+        "query": {
+            "bool": {
+                "should": [
+                    {
+                        "term": {
+                            "category.keyword": {
+                                "value": source["category"],
+                                "boost": 4.0
+                            }
+                        }
+                    },
+                    {
+                        "term": {
+                            "seller_id": {
+                                "value": source["seller_id"],
+                                "boost": 2.0
+                            }
+                        }
+                    },
+                    {
+                        "range": {
+                            "price": {
+                                "gte": float(source["price"]) * 0.7,
+                                "lte": float(source["price"]) * 1.3,
+                                "boost": 1.5
+                            }
+                        }
+                    },
+                    {
+                        "more_like_this": {
+                            "fields": ["product_name", "description"],
+                            "like": source["description"],
+                            "min_term_freq": 1,
+                            "max_query_terms": 12,
+                            "minimum_should_match": "30%",
+                            "boost": 1.0
+                        }
+                    }
+                ],
+                "must_not": [
+                    {"term": {"product_id": str(product_id)}}
+                ],
+                "filter": [
+                    {"term": {"status": "available"}},
+                    {"range": {"in_stock": {"gt": 0}}}
+                ],
+                "minimum_should_match": 1
+            }
+        },
+        "size": size,
+        "_source": False,
+        "sort": [
+            {"_score": "desc"},
+            {"avg_rating": {"order": "desc", "missing": "_last"}},
+            {"price": "asc"}
+        ]
+    }
+
+async def compute_similar_products(es, product_id) -> Optional[List[str]]:
+    """Ids of the products most similar to product_id, or None if it is not indexed."""
+    try:
+        product = await es.get(index=PRODUCT_INDEX_NAME, id=str(product_id))
+    except NotFoundError:
+        return None
+
+    response = await es.search(
+        index=PRODUCT_INDEX_NAME,
+        body=similar_products_query(product["_source"], product_id, SIMILAR_PRODUCTS_TOP_N)
+    )
+    _similar_stats["computed"] += 1
+    return [hit["_id"] for hit in response["hits"]["hits"]]
+
+async def get_cached_similar_products(product_id) -> Optional[List[str]]:
+    try:
+        cached = await db.redis_client.get(similar_products_key(product_id))
+    except RedisError as e:
+        _similar_stats["errors"] += 1
+        logger.error(f"Redis error while reading similar products: {e}")
+        return None
+    if cached is None:
+        _similar_stats["misses"] += 1
+        return None
+    _similar_stats["hits"] += 1
+    return json.loads(cached)
+
+async def store_similar_products(product_id, similar_ids: Optional[List[str]]):
+    try:
+        if similar_ids is None:
+            await db.redis_client.delete(similar_products_key(product_id))
+        else:
+            async with db.redis_client.pipeline(transaction=False) as pipe:
+                pipe.set(similar_products_key(product_id), json.dumps(similar_ids), ex=SIMILAR_PRODUCTS_TTL_SECONDS)
+                for similar_id in similar_ids:
+                    pipe.sadd(similar_refs_key(similar_id), str(product_id))
+                    pipe.expire(similar_refs_key(similar_id), SIMILAR_PRODUCTS_TTL_SECONDS)
+                await pipe.execute()
+    except RedisError as e:
+        _similar_stats["errors"] += 1
+        logger.error(f"Redis error while storing similar products: {e}")
+
+async def refresh_similar_products(product_ids) -> int:
+    """Recompute and store the lists for product_ids; returns how many were refreshed."""
+    es = get_elasticsearch_client().get_client()
+    semaphore = asyncio.Semaphore(SIMILAR_PRODUCTS_CONCURRENCY)
+
+    async def refresh(product_id):
+        async with semaphore:
+            try:
+                await store_similar_products(product_id, await compute_similar_products(es, product_id))
+                return True
+            except Exception as e:
+                _similar_stats["errors"] += 1
+                logger.error(f"Failed to compute similar products for {product_id}: {e}")
+                return False
+
+    results = await asyncio.gather(*(refresh(product_id) for product_id in product_ids))
+    return sum(results)
+
+async def pop_referencing_products(product_ids) -> Set[str]:
+    """Products whose lists contain any of product_ids; the references are re-added on recompute."""
+    async with db.redis_client.pipeline(transaction=True) as pipe:
+        for product_id in product_ids:
+            pipe.smembers(similar_refs_key(product_id))
+            pipe.delete(similar_refs_key(product_id))
+        results = await pipe.execute()
+    return set().union(*results[::2])
+
+async def refresh_all_similar_products() -> int:
+    async with db.pool.acquire() as conn:
+        rows = await conn.fetch('SELECT product_id FROM "Products" ORDER BY product_id')
+    refreshed = 0
+    for start in range(0, len(rows), SIMILAR_REFRESH_BATCH):
+        batch = [row["product_id"] for row in rows[start:start + SIMILAR_REFRESH_BATCH]]
+        refreshed += await refresh_similar_products(batch)
+    return refreshed
+
+async def run_full_similar_refresh():
+    try:
+        refreshed = await refresh_all_similar_products()
+        logger.info(f"Precomputed similar products for {refreshed} products")
+    except asyncio.CancelledError:
+        # Stopped by shutdown; the next start redoes the pass instead of waiting out the key
+        await db.redis_client.delete(SIMILAR_FULL_REFRESH_KEY)
+        raise
+    except Exception as e:
+        logger.error(f"Full similar products refresh failed: {e}")
+        # Let the next round (here or in another worker) try again
+        await db.redis_client.delete(SIMILAR_FULL_REFRESH_KEY)
+
+async def run_similar_products_refresh():
+    """Background loop keeping the precomputed similar-products lists current.
+
+    Products the outbox drainer touched, and every product whose list holds
+    one of them, are recomputed within a few seconds.
+    Every list is rebuilt once per SIMILAR_FULL_REFRESH_SECONDS by whichever
+    worker claims the refresh key first, but only once the product alias
+    exists, since every lookup would miss before the first index build. The
+    full pass runs as its own task so dirty products keep being served
+    while it goes through the catalog.
+    """
+    full_refresh: Optional[asyncio.Task] = None
+    try:
+        while True:
+            try:
+                es_client = get_elasticsearch_client()
+                await es_client.initialize()
+
+                if (
+                    (full_refresh is None or full_refresh.done())
+                    and await get_live_index(es_client.get_client()) is not None
+                    and await db.redis_client.set(
+                        SIMILAR_FULL_REFRESH_KEY, "1", nx=True, ex=SIMILAR_FULL_REFRESH_SECONDS
+                    )
+                ):
+                    full_refresh = asyncio.create_task(run_full_similar_refresh())
+
+                while True:
+                    dirty = await db.redis_client.spop(SIMILAR_DIRTY_KEY, SIMILAR_REFRESH_BATCH)
+                    if not dirty:
+                        break
+                    # A changed product also leaves stale entries in every list that holds it
+                    await refresh_similar_products(set(dirty) | await pop_referencing_products(dirty))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Similar products refresh failed: {e}")
+            await asyncio.sleep(SIMILAR_REFRESH_INTERVAL_SECONDS)
+    finally:
+        if full_refresh is not None:
+            full_refresh.cancel()
+            await asyncio.gather(full_refresh, return_exceptions=True)
@@ -1,14 +1,22 @@
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, BinaryIO, Iterable, Iterator
 import db
+from storage.client import get_storage_client
 from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile
 from auth.depends import get_current_user
 from .seller import check_seller_role, get_seller_id 
 
 import csv
 import openpyxl
+import zipfile
+from openpyxl.utils.exceptions import InvalidFileException
 import json
 import xml.etree.ElementTree as ET
-from io import StringIO, BytesIO
+import queue
+from decimal import Decimal, InvalidOperation
+from io import TextIOWrapper
+from itertools import islice
+from uuid import UUID, uuid4
+import os
 
 import logging
 
@@ -21,145 +29,357 @@ router = APIRouter(
     tags=["ETL"]
 )
 
-
-def process_csv_file(content: bytes, required_fields: set) -> List[Dict[str, Any]]:
-
-    products = []
-    decoded = content.decode('utf-8')
-    sample = decoded[:2048]
+# Rows parsed ahead of the database; memory stays bounded by this, not by the file size
+ETL_BATCH_SIZE = 1000
+# Characters read from a JSON upload at a time
+JSON_READ_SIZE = 64 * 1024
+# A JSON array item may span several reads up to this many characters
+JSON_MAX_ITEM_SIZE = 1024 * 1024
+# Longest token the end of a read can cut in two ("false", "\uXXXX", "1e-10")
+JSON_TOKEN_TAIL = 8
+# Rejected rows listed in the upload summary; the rest are only counted
+ETL_REJECT_SAMPLE = 100
+MAX_TEXT_LENGTH = 255
+# NUMERIC(12,2)
+MAX_PRICE = Decimal("9999999999.99")
+REQUIRED_FIELDS = {"product_name", "description", "category", "price", "in_stock"}
+# Errors that mean the upload itself is unreadable, so retrying the job cannot help
+FILE_FORMAT_ERRORS = (UnicodeError, csv.Error, zipfile.BadZipFile, InvalidFileException, ET.ParseError, json.JSONDecodeError)
+STAGING_COLUMNS = ["row_number", "seller_id", "product_name", "description", "category", "price", "in_stock"]
+
+
+class RejectReport:
+    def __init__(self, limit: int = ETL_REJECT_SAMPLE):
+        self.limit = limit
+        self.count = 0
+        self.rows = []
+
+    def add(self, row: int, reason: str):
+        self.count += 1
+        if len(self.rows) < self.limit:
+            self.rows.append({"row": row, "reason": reason})
+
+
+def clean_product(raw: Dict[str, Any], required_fields: set, rejects: RejectReport, row: int) -> Optional[Dict[str, Any]]:
+    """Validated product for one input row, or None after recording why it was rejected.
+
+    Rows are checked against the Products constraints up front, since one bad
+    row would otherwise abort the whole COPY.
+    """
+    missing = sorted(field for field in required_fields if raw.get(field) is None or str(raw.get(field)).strip() == "")
+    if missing:
+        rejects.add(row, f"Missing required fields: {', '.join(missing)}")
+        return None
+
+    product = {field: raw.get(field) for field in required_fields}
+    for field in ("product_name", "description", "category"):
+        product[field] = str(product[field]).strip()
+    try:
+        product["price"] = Decimal(str(product["price"]).strip())
+        product["in_stock"] = int(product["in_stock"])
+    except (InvalidOperation, ValueError, TypeError):
+        rejects.add(row, "price and in_stock must be numbers")
+        return None
+
+    if not product["price"].is_finite() or not 0 < product["price"] <= MAX_PRICE:
+        rejects.add(row, "price must be positive and below 10^10")
+        return None
+    if product["in_stock"] < 0:
+        rejects.add(row, "in_stock must not be negative")
+        return None
+    too_long = [field for field in ("product_name", "category") if len(product[field]) > MAX_TEXT_LENGTH]
+    if too_long:
+        rejects.add(row, f"Longer than {MAX_TEXT_LENGTH} characters: {', '.join(too_long)}")
+        return None
+
+    product["row"] = row
+    return product
+
+
+def process_csv_file(fileobj: BinaryIO, required_fields: set, rejects: RejectReport) -> Iterator[Dict[str, Any]]:
+    text = TextIOWrapper(fileobj, encoding='utf-8', newline='')
+    sample = text.read(2048)
+    text.seek(0)
     sniffer = csv.Sniffer()
     try:
         dialect = sniffer.sniff(sample, delimiters=",;\t|")
         delimiter = dialect.delimiter
     except Exception:
         delimiter = ',' 
-    reader = csv.DictReader(StringIO(decoded), delimiter=delimiter)
-    for row in reader:
-
-        product = {field: row.get(field) for field in required_fields}
-
-        try:
-            product["price"] = float(product["price"])
-            product["in_stock"] = int(product["in_stock"])
-        except (ValueError, TypeError):
-            logger.warning(f"Invalid data in row: {row}")
-            continue  
-        if not all(product.get(field) for field in required_fields): 
-            logger.warning(f"Missing required fields in row: {row}")
-            continue  
-        products.append(product)
-    return products
-
-
-def process_xlsx_file(content: bytes, required_fields: set) -> List[Dict[str, Any]]:
-
-    products = []
-    workbook = openpyxl.load_workbook(filename=BytesIO(content)) 
-    sheet = workbook.active
-    header = [cell.value for cell in sheet[1]]
-    for row_idx in range(2, sheet.max_row + 1):
-        row_values = [cell.value for cell in sheet[row_idx]]
-        row_dict = dict(zip(header, row_values))
-        product = {field: row_dict.get(field) for field in required_fields}
-        try:
-            product["price"] = float(product["price"])
-            product["in_stock"] = int(product["in_stock"])
-        except (ValueError, TypeError):
-            logger.warning(f"Invalid data in row {row_idx}: {row_dict}")
-            continue
-        if not all(product.get(field) for field in required_fields): 
-            logger.warning(f"Missing required fields in row {row_idx}: {row_dict}")
+    try:
+        reader = csv.DictReader(text, delimiter=delimiter)
+        for row in reader:
+            product = clean_product(row, required_fields, rejects, reader.line_num)
+            if product is not None:
+                yield product
+    finally:
+        # Leave the upload open for whoever owns it
+        text.detach()
+
+
+def process_xlsx_file(fileobj: BinaryIO, required_fields: set, rejects: RejectReport) -> Iterator[Dict[str, Any]]:
+    workbook = openpyxl.load_workbook(filename=fileobj, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        for row_idx, row_values in enumerate(rows, start=2):
+            product = clean_product(dict(zip(header, row_values)), required_fields, rejects, row_idx)
+            if product is not None:
+                yield product
+    finally:
+        workbook.close()
+
+
+def iter_json_array(text: TextIOWrapper) -> Iterator[Any]:
+    """Yield the items of a top-level JSON array one by one."""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    eof = False
+
+    def fill() -> bool:
+        nonlocal buffer, pos, eof
+        chunk = text.read(JSON_READ_SIZE)
+        if not chunk:
+            eof = True
+            return False
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        return True
+
+    def skip_whitespace() -> Optional[str]:
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos].isspace():
+                pos += 1
+            if pos < len(buffer):
+                return buffer[pos]
+            if not fill():
+                return None
+
+    if skip_whitespace() != "[":
+        raise HTTPException(status_code=400, detail="JSON file must contain an array of products")
+    pos += 1
+
+    expect_item = True
+    empty = True
+    while True:
+        char = skip_whitespace()
+        if char is None:
+            raise json.JSONDecodeError("Unterminated array", buffer, pos)
+        if char == "]":
+            if expect_item and not empty:
+                raise json.JSONDecodeError("Trailing comma", buffer, pos)
+            return
+        if not expect_item:
+            if char != ",":
+                raise json.JSONDecodeError("Expecting ',' delimiter", buffer, pos)
+            pos += 1
+            expect_item = True
             continue
-        products.append(product)
-    return products
-
 
-def process_json_file(content: bytes, required_fields: set) -> List[Dict[str, Any]]:
-
-    products = []
+        while True:
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as e:
+                # Only an error at the very end of the buffer (or in a string
+                # still open there) may mean the item is cut; anything else is
+                # malformed and must not pull the rest of the file in
+                cut = e.pos >= len(buffer) - JSON_TOKEN_TAIL or e.msg.startswith("Unterminated string")
+                if not cut or eof:
+                    raise
+                if len(buffer) - pos > JSON_MAX_ITEM_SIZE:
+                    raise json.JSONDecodeError("Array item is too large", buffer, pos)
+                if not fill():
+                    raise
+                continue
+            # A number or literal at the end of the buffer may continue in the next chunk
+            if end >= len(buffer) - JSON_TOKEN_TAIL and not eof and fill():
+                continue
+            break
+        pos = end
+        expect_item = False
+        empty = False
+        yield item
+
+
+def process_json_file(fileobj: BinaryIO, required_fields: set, rejects: RejectReport) -> Iterator[Dict[str, Any]]:
+    text = TextIOWrapper(fileobj, encoding='utf-8')
     try:
-        decoded = content.decode('utf-8')
-        json_data = json.loads(decoded)
-        
-
-        if not isinstance(json_data, list):
-            raise HTTPException(status_code=400, detail="JSON file must contain an array of products")
-        
-        for item in json_data:
+        for index, item in enumerate(iter_json_array(text), start=1):
             if not isinstance(item, dict):
-                continue  
-            
-            
-            product = {field: item.get(field) for field in required_fields}
-            
-            try:
-                product["price"] = float(product["price"])
-                product["in_stock"] = int(product["in_stock"])
-            except (ValueError, TypeError):
-                logger.warning(f"Invalid data in product: {item}")
-                continue  
-            if not all(product.get(field) for field in required_fields):
-                logger.warning(f"Missing required fields in product: {item}")
-                continue  
-            
-            products.append(product)
-            
+                rejects.add(index, "Array item is not an object")
+                continue
+            product = clean_product(item, required_fields, rejects, index)
+            if product is not None:
+                yield product
+    except HTTPException:
+        raise
     except json.JSONDecodeError:
         raise HTTPException(status_code=400, detail="Invalid JSON format")
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error processing JSON file: {str(e)}")
-    return products
+    finally:
+        text.detach()
 
 
-def process_xml_file(content: bytes, required_fields: set) -> List[Dict[str, Any]]:
-    products = []
+def process_xml_file(fileobj: BinaryIO, required_fields: set, rejects: RejectReport) -> Iterator[Dict[str, Any]]:
     try:
-        decoded = content.decode('utf-8')
-        root = ET.fromstring(decoded)
-        
-        for product_elem in root.findall('.//product'):
-            product = {}
-            
-   
+        parents = []
+        index = 0
+        for event, elem in ET.iterparse(fileobj, events=("start", "end")):
+            if event == "start":
+                parents.append(elem)
+                continue
+            parents.pop()
+            if elem.tag != "product":
+                continue
+            index += 1
+
+            raw = {}
             for field in required_fields:
-
-                if field in product_elem.attrib:
-                    product[field] = product_elem.attrib[field]
+                if field in elem.attrib:
+                    raw[field] = elem.attrib[field]
                 else:
-    
-                    child_elem = product_elem.find(field)
+                    child_elem = elem.find(field)
                     if child_elem is not None and child_elem.text:
-                        product[field] = child_elem.text.strip()
+                        raw[field] = child_elem.text.strip()
                     else:
-                        product[field] = None
-            
+                        raw[field] = None
+
+            # Drop the finished element so the tree never grows with the file
+            if parents:
+                parents[-1].remove(elem)
+            else:
+                elem.clear()
+
+            product = clean_product(raw, required_fields, rejects, index)
+            if product is not None:
+                yield product
 
-            try:
-                if product.get("price"):
-                    product["price"] = float(product["price"])
-                if product.get("in_stock"):
-                    product["in_stock"] = int(product["in_stock"])
-            except (ValueError, TypeError):
-                logger.warning(f"Invalid data in product: {product}")
-                continue  
-            
-
-            if not all(product.get(field) for field in required_fields):
-                logger.warning(f"Missing required fields in product: {product}")
-                continue 
-            
-            products.append(product)
-            
     except ET.ParseError:
         raise HTTPException(status_code=400, detail="Invalid XML format")
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error processing XML file: {str(e)}")
-    return products
 
 
-@router.post("/products/upload")
-async def upload_products_via_file(file: UploadFile = File(...),current_user: dict = Depends(get_current_user)):
+PARSERS = {
+    '.csv': process_csv_file,
+    '.xlsx': process_xlsx_file,
+    '.json': process_json_file,
+    '.xml': process_xml_file,
+}
+
+
+def get_parser(filename: str):
+    for extension, parser in PARSERS.items():
+        if filename.endswith(extension):
+            return parser
+    raise HTTPException(status_code=400, detail="Only CSV, XLSX, JSON, or XML files are supported")
+
+
+def take(products: Iterator[Dict[str, Any]], size: int) -> List[Dict[str, Any]]:
+    return list(islice(products, size))
+
 
+def skip_records(products: Iterator[Dict[str, Any]], rejects: RejectReport, position: int):
+    """Advance past the first position input records (valid or rejected)."""
+    yielded = 0
+    while yielded + rejects.count < position:
+        if next(products, None) is None:
+            return
+        yielded += 1
+
+
+def parse_to_queue(path: str, filename: str, position: int, rejected_count: int, rejected_rows: List[Dict[str, Any]],
+                   chunk_rows: int, chunks, stop):
+    """Parse and validate a stored upload in a worker process, sending it back in chunks.
+
+    Messages are (kind, payload, rejected_count, rejected_rows) with kind
+    "chunk", "done" or "invalid". The queue is bounded, so parsing never runs
+    more than a few chunks ahead of the database; setting stop makes it quit.
+    """
+    def send(message) -> bool:
+        while not stop.is_set():
+            try:
+                chunks.put(message, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    rejects = RejectReport()
+    try:
+        with open(path, "rb") as fileobj:
+            products = get_parser(filename)(fileobj, REQUIRED_FIELDS, rejects)
+            if position:
+                skip_records(products, rejects, position)
+                # Rows before the checkpoint are already in the stored report
+                rejects.count, rejects.rows = rejected_count, rejected_rows
+
+            while True:
+                chunk = take(products, chunk_rows)
+                if not send(("chunk" if chunk else "done", chunk, rejects.count, rejects.rows)) or not chunk:
+                    return
+    except HTTPException as e:
+        # HTTPException does not survive pickling; send the message instead
+        send(("invalid", str(e.detail), rejects.count, rejects.rows))
+    except FILE_FORMAT_ERRORS as e:
+        send(("invalid", f"Invalid file: {e}", rejects.count, rejects.rows))
+
+
+def batched(items: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+async def load_products(conn, seller_id: int, products: Iterable[Dict[str, Any]]) -> int:
+    """COPY products into a staging table and move them into Products in one statement.
+
+    Must run inside a transaction; the staging table is dropped on commit.
+    Returns how many products were inserted.
+    """
+    await conn.execute(
+        '''
+        CREATE TEMP TABLE etl_products_staging (
+            row_number INTEGER,
+            seller_id INTEGER,
+            product_name VARCHAR(255),
+            description TEXT,
+            category VARCHAR(255),
+            price NUMERIC(12,2),
+            in_stock INTEGER
+        ) ON COMMIT DROP
+        '''
+    )
+    for batch in batched(products, ETL_BATCH_SIZE):
+        await conn.copy_records_to_table(
+            "etl_products_staging",
+            records=[
+                (product["row"], seller_id, product["product_name"], product["description"],
+                 product["category"], product["price"], product["in_stock"])
+                for product in batch
+            ],
+            columns=STAGING_COLUMNS
+        )
+    # No parameters: the table is new in every transaction, so a cached plan would go stale
+    result = await conn.execute(
+        '''
+        INSERT INTO "Products" (seller_id, product_name, description, category, price, in_stock, status)
+        SELECT seller_id, product_name, description, category, price, in_stock, 'waiting'
+        FROM etl_products_staging
+        ORDER BY row_number
+        '''
+    )
+    return int(result.split()[-1])
+
+
+@router.post("/products/upload", status_code=status.HTTP_202_ACCEPTED)
+async def upload_products_via_file(file: UploadFile = File(...),current_user: dict = Depends(get_current_user)):
+    """Store the file and queue it; poll /etl/jobs/{job_id} for progress."""
  
     check_seller_role(current_user)
     
@@ -173,46 +393,66 @@ async def upload_products_via_file(file: UploadFile = File(...),current_user: di
         seller_id = await get_seller_id(conn, current_user["user_id"])
         
 
-    products = []
-    required_fields = {"product_name", "description", "category", "price", "in_stock"}
-
-    content = await file.read()
+    get_parser(file.filename)
+    object_name = f"etl/{seller_id}/{uuid4().hex}{os.path.splitext(file.filename)[1]}"
 
-    if file.filename.endswith('.csv'):
-        products = process_csv_file(content, required_fields)
-    elif file.filename.endswith('.xlsx'):
-        products = process_xlsx_file(content, required_fields)
-    elif file.filename.endswith('.json'):
-        products = process_json_file(content, required_fields)
-    elif file.filename.endswith('.xml'):
-        products = process_xml_file(content, required_fields)
-    else:
-        raise HTTPException(status_code=400, detail="Only CSV, XLSX, JSON, or XML files are supported")
+    # The upload is already spooled to disk; stream it to storage from there
+    file.file.seek(0, os.SEEK_END)
+    size = file.file.tell()
+    file.file.seek(0)
+    try:
+        storage = get_storage_client()
+        await storage.initialize()
+        await storage.upload(object_name, file.file, size)
+    except Exception as e:
+        logger.error(f"Failed to store ETL upload {file.filename}: {e}")
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="File storage is unavailable")
 
-    if not products:
-        raise HTTPException(status_code=400, detail="No valid products found in file")
-    
-    
-    inserted = []
     async with db.pool.acquire() as conn:
-        async with conn.transaction():
-            for product in products:
-                row = await conn.fetchrow(
-                    'INSERT INTO "Products" (seller_id, product_name, description, category, price, in_stock, status) '
-                    'VALUES ($1, $2, $3, $4, $5, $6, $7) RETURNING *',
-                    seller_id, product["product_name"], product["description"], product["category"], 
-                    product["price"], product["in_stock"], "waiting"
-                )
-                inserted.append(dict(row))
-    
-    return {"inserted": inserted, "count": len(inserted)}
-
-
-
-
-
-
+        job_id = await conn.fetchval(
+            '''
+            INSERT INTO "Etl_jobs" (seller_id, filename, object_name)
+            VALUES ($1, $2, $3)
+            RETURNING job_id
+            ''',
+            seller_id, file.filename[:255], object_name
+        )
 
+    return {"job_id": str(job_id), "status": "queued"}
 
 
+@router.get("/jobs/{job_id}")
+async def get_etl_job(job_id: UUID, current_user: dict = Depends(get_current_user)):
+    check_seller_role(current_user)
 
+    async with db.pool.acquire() as conn:
+        seller_id = await get_seller_id(conn, current_user["user_id"])
+        job = await conn.fetchrow(
+            '''
+            SELECT *, EXTRACT(EPOCH FROM COALESCE(finished_at, heartbeat_at) - started_at) AS elapsed
+            FROM "Etl_jobs"
+            WHERE job_id = $1 AND seller_id = $2
+            ''',
+            job_id, seller_id
+        )
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    elapsed = float(job["elapsed"]) if job["elapsed"] else None
+    rejected_rows = json.loads(job["rejected_rows"])
+    return {
+        "job_id": str(job["job_id"]),
+        "filename": job["filename"],
+        "status": job["status"],
+        "rows_processed": job["rows_processed"],
+        "rows_inserted": job["rows_inserted"],
+        "rows_rejected": job["rows_rejected"],
+        "rejected_rows": rejected_rows,
+        "rejected_rows_truncated": job["rows_rejected"] > len(rejected_rows),
+        "rows_per_second": round(job["rows_processed"] / elapsed, 1) if elapsed else None,
+        "attempts": job["attempts"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"]
+    }
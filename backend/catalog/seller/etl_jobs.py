@@ -0,0 +1,218 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import tempfile
+import threading
+
+from fastapi import HTTPException
+import db
+from storage.client import get_storage_client
+from .etl import RejectReport, load_products, parse_to_queue
+
+logger = logging.getLogger(__name__)
+
+ETL_WORKERS = int(os.getenv("ETL_WORKERS", "2"))
+# Products loaded and checkpointed per transaction
+ETL_JOB_CHUNK_ROWS = int(os.getenv("ETL_JOB_CHUNK_ROWS", "10000"))
+ETL_POLL_INTERVAL_SECONDS = float(os.getenv("ETL_POLL_INTERVAL_SECONDS", "1"))
+# A running job without a checkpoint for this long is taken over by another worker
+ETL_JOB_STALE_SECONDS = int(os.getenv("ETL_JOB_STALE_SECONDS", "300"))
+ETL_JOB_MAX_ATTEMPTS = 3
+# Processes parsing and validating uploads; one per concurrently running job is enough
+ETL_PARSE_PROCESSES = int(os.getenv("ETL_PARSE_PROCESSES", str(ETL_WORKERS)))
+# Parsed chunks a job may hold in flight between its parser process and the database
+ETL_PARSE_QUEUE_CHUNKS = 2
+ETL_PARSE_POLL_SECONDS = 1.0
+
+_parse_pool: Optional[ProcessPoolExecutor] = None
+_parse_manager = None
+_parse_pool_lock = threading.Lock()
+
+
+def get_parse_pool() -> Tuple[ProcessPoolExecutor, "multiprocessing.managers.SyncManager"]:
+    global _parse_pool, _parse_manager
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            # spawn: forking a process that runs an event loop and thread pools is not safe
+            context = multiprocessing.get_context("spawn")
+            _parse_manager = context.Manager()
+            _parse_pool = ProcessPoolExecutor(max_workers=ETL_PARSE_PROCESSES, mp_context=context)
+        return _parse_pool, _parse_manager
+
+
+def shutdown_parse_pool():
+    global _parse_pool, _parse_manager
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            return
+        _parse_pool.shutdown(wait=False, cancel_futures=True)
+        _parse_manager.shutdown()
+        _parse_pool = _parse_manager = None
+
+
+class EtlJobLost(Exception):
+    """Another worker took the job over; this one must stop without writing."""
+
+
+async def claim_etl_job():
+    async with db.pool.acquire() as conn:
+        return await conn.fetchrow(
+            '''
+            UPDATE "Etl_jobs"
+            SET status = 'running',
+                attempts = attempts + 1,
+                started_at = COALESCE(started_at, now()),
+                heartbeat_at = now()
+            WHERE job_id = (
+                SELECT job_id FROM "Etl_jobs"
+                WHERE (status = 'queued'
+                       OR (status = 'running' AND heartbeat_at < now() - make_interval(secs => $1)))
+                  AND attempts < $2
+                ORDER BY created_at
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING *
+            ''',
+            ETL_JOB_STALE_SECONDS, ETL_JOB_MAX_ATTEMPTS
+        )
+
+
+async def next_parsed(chunks, parsing: asyncio.Future):
+    """Next message from a job's parser process, failing if the process is gone."""
+    while True:
+        try:
+            return await asyncio.to_thread(chunks.get, True, ETL_PARSE_POLL_SECONDS)
+        except queue.Empty:
+            if parsing.done():
+                parsing.result()
+                raise RuntimeError("ETL parser exited without finishing the file")
+
+
+async def checkpoint(conn, job, inserted: int, rejects: RejectReport, status: str = "running", error: Optional[str] = None):
+    result = await conn.execute(
+        '''
+        UPDATE "Etl_jobs"
+        SET rows_processed = $3 + $4,
+            rows_inserted = $3,
+            rows_rejected = $4,
+            rejected_rows = $5::jsonb,
+            status = $6,
+            error = $7,
+            heartbeat_at = now(),
+            finished_at = CASE WHEN $6 IN ('done', 'failed') THEN now() END
+        WHERE job_id = $1 AND attempts = $2
+        ''',
+        job["job_id"], job["attempts"], inserted, rejects.count, json.dumps(rejects.rows, ensure_ascii=False),
+        status, error
+    )
+    if result == "UPDATE 0":
+        raise EtlJobLost()
+
+
+async def process_etl_job(job):
+    """Load one job's file from object storage, resuming after its last checkpoint.
+
+    Parsing and validation run in a process from the parse pool and stream
+    back in chunks, so the event loop only does I/O. Every chunk is COPYed and
+    checkpointed in the same transaction, so a crash between chunks neither
+    loses nor duplicates products.
+    """
+    storage = get_storage_client()
+    await storage.initialize()
+    inserted = job["rows_inserted"]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "upload" + os.path.splitext(job["filename"])[1])
+        await storage.download(job["object_name"], path)
+
+        # The first call starts the manager process; keep that off the loop too
+        pool, manager = await asyncio.to_thread(get_parse_pool)
+        chunks = manager.Queue(maxsize=ETL_PARSE_QUEUE_CHUNKS)
+        stop = manager.Event()
+        parsing = asyncio.get_running_loop().run_in_executor(
+            pool, parse_to_queue,
+            path, job["filename"], job["rows_processed"], job["rows_rejected"], json.loads(job["rejected_rows"]),
+            ETL_JOB_CHUNK_ROWS, chunks, stop
+        )
+        rejects = RejectReport()
+        try:
+            while True:
+                kind, payload, rejects.count, rejects.rows = await next_parsed(chunks, parsing)
+                if kind == "invalid":
+                    raise HTTPException(status_code=400, detail=payload)
+                if kind == "done":
+                    break
+                async with db.pool.acquire() as conn:
+                    async with conn.transaction():
+                        loaded = await load_products(conn, job["seller_id"], payload)
+                        await checkpoint(conn, job, inserted + loaded, rejects)
+                inserted += loaded
+        finally:
+            stop.set()
+        await parsing
+
+    async with db.pool.acquire() as conn:
+        if inserted:
+            await checkpoint(conn, job, inserted, rejects, status="done")
+        else:
+            await checkpoint(conn, job, inserted, rejects, status="failed", error="No valid products found in file")
+
+    try:
+        await storage.remove(job["object_name"])
+    except Exception as e:
+        logger.error(f"Failed to remove ETL upload {job['object_name']}: {e}")
+
+
+async def release_etl_job(job, error: str, retry: bool, refund: bool = False):
+    """Requeue the job (or fail it for good); refund gives the attempt back."""
+    async with db.pool.acquire() as conn:
+        await conn.execute(
+            '''
+            UPDATE "Etl_jobs"
+            SET status = CASE WHEN $3 AND (attempts < $4 OR $6) THEN 'queued' ELSE 'failed' END,
+                error = $2,
+                attempts = CASE WHEN $6 THEN attempts - 1 ELSE attempts END,
+                finished_at = CASE WHEN $3 AND (attempts < $4 OR $6) THEN NULL ELSE now() END
+            WHERE job_id = $1 AND attempts = $5 AND status = 'running'
+            ''',
+            job["job_id"], error, retry, ETL_JOB_MAX_ATTEMPTS, job["attempts"], refund
+        )
+
+
+async def run_etl_worker():
+    """Background loop claiming ETL jobs one at a time."""
+    while True:
+        job = None
+        try:
+            job = await claim_etl_job()
+            if job is None:
+                await asyncio.sleep(ETL_POLL_INTERVAL_SECONDS)
+                continue
+
+            logger.info(f"Processing ETL job {job['job_id']} ({job['filename']}), attempt {job['attempts']}")
+            await process_etl_job(job)
+            logger.info(f"ETL job {job['job_id']} finished")
+        except asyncio.CancelledError:
+            if job is not None:
+                # Hand the job back so the next start resumes it without waiting for it to go stale
+                await release_etl_job(job, "Interrupted by shutdown", retry=True, refund=True)
+            raise
+        except EtlJobLost:
+            logger.warning(f"ETL job {job['job_id']} was taken over by another worker")
+        except HTTPException as e:
+            # The file itself is broken; retrying will not help
+            await release_etl_job(job, str(e.detail), retry=False)
+        except Exception as e:
+            logger.error(f"ETL job failed: {e}")
+            if job is not None:
+                try:
+                    await release_etl_job(job, str(e), retry=True)
+                except Exception as release_error:
+                    logger.error(f"Failed to release ETL job {job['job_id']}: {release_error}")
+            await asyncio.sleep(ETL_POLL_INTERVAL_SECONDS)
@@ -1,25 +1,130 @@
 import asyncpg
 import json
+import os
 from typing import Optional, List
 from redis.asyncio import Redis
 import datetime
 import asyncio
+import time
 import logging
+from local_cache import TTLCache
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DATABASE_URL = os.getenv("DATABASE_URL")
+
 DB_CONFIG = {
-    "user": "postgres",
-    "password": "123",
-    "database": "meowshop",
-    "host": "db",
-    "port": 5432
+    "user": os.getenv("DB_USER", "postgres"),
+    "password": os.getenv("DB_PASSWORD", "123"),
+    "database": os.getenv("DB_NAME", "meowshop"),
+    "host": os.getenv("DB_HOST", "db"),
+    "port": int(os.getenv("DB_PORT", "5432"))
+}
+
+# Sized per worker process: total server connections = workers * DB_POOL_MAX_SIZE.
+# Set DB_STATEMENT_CACHE_SIZE=0 when running behind pgbouncer in transaction mode.
+POOL_CONFIG = {
+    "min_size": int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+    "max_size": int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+    "max_inactive_connection_lifetime": float(os.getenv("DB_POOL_MAX_INACTIVE_LIFETIME", "300")),
+    "command_timeout": float(os.getenv("DB_COMMAND_TIMEOUT", "30")),
+    "statement_cache_size": int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100")),
+    "server_settings": {
+        "application_name": os.getenv("DB_APPLICATION_NAME", "meowshop-backend"),
+    },
 }
+DB_POOL_ACQUIRE_TIMEOUT = float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", "10"))
+
+# Optional streaming replica for read-only handlers; without it every read goes to the primary.
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+# How long a user's reads stick to the primary after they wrote something (covers replica lag).
+READ_YOUR_WRITES_WINDOW_SECONDS = int(os.getenv("READ_YOUR_WRITES_WINDOW_SECONDS", "5"))
 
 redis_client = Redis(host='redis', port=6379, decode_responses=True)
 
-pool: asyncpg.pool.Pool | None = None
+
+class _InstrumentedAcquire:
+    def __init__(self, pool: "InstrumentedPool", timeout: Optional[float]):
+        self._pool = pool
+        self._timeout = timeout
+        self._conn = None
+
+    async def __aenter__(self):
+        self._conn = await self._pool._acquire(self._timeout)
+        return self._conn
+
+    async def __aexit__(self, *exc):
+        conn, self._conn = self._conn, None
+        await self._pool.release(conn)
+
+
+class InstrumentedPool:
+    """asyncpg pool proxy that records how long callers wait for a connection."""
+
+    def __init__(self, pool: asyncpg.pool.Pool, acquire_timeout: float):
+        self._pool = pool
+        self.acquire_timeout = acquire_timeout
+        self._stats = {
+            "acquires": 0,
+            "acquire_timeouts": 0,
+            "waiting": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+        }
+
+    def acquire(self, *, timeout: Optional[float] = None) -> _InstrumentedAcquire:
+        return _InstrumentedAcquire(self, timeout if timeout is not None else self.acquire_timeout)
+
+    async def _acquire(self, timeout: Optional[float]):
+        started = time.perf_counter()
+        self._stats["waiting"] += 1
+        try:
+            conn = await self._pool.acquire(timeout=timeout)
+        except asyncio.TimeoutError:
+            self._stats["acquire_timeouts"] += 1
+            logger.warning(f"Timed out after {timeout}s waiting for a database connection")
+            raise
+        finally:
+            self._stats["waiting"] -= 1
+            waited = time.perf_counter() - started
+            self._stats["wait_seconds_total"] += waited
+            self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], waited)
+        self._stats["acquires"] += 1
+        return conn
+
+    def __getattr__(self, name):
+        return getattr(self._pool, name)
+
+    def stats(self) -> dict:
+        size = self._pool.get_size()
+        in_use = size - self._pool.get_idle_size()
+        max_size = self._pool.get_max_size()
+        acquires = self._stats["acquires"]
+        return {
+            "min_size": self._pool.get_min_size(),
+            "max_size": max_size,
+            "size": size,
+            "in_use": in_use,
+            "utilization": round(in_use / max_size, 4) if max_size else 0.0,
+            "waiting": self._stats["waiting"],
+            "acquires": acquires,
+            "acquire_timeouts": self._stats["acquire_timeouts"],
+            "avg_wait_ms": round(self._stats["wait_seconds_total"] / acquires * 1000, 3) if acquires else 0.0,
+            "max_wait_ms": round(self._stats["wait_seconds_max"] * 1000, 3),
+        }
+
+
+pool: InstrumentedPool | None = None
+read_pool: InstrumentedPool | None = None
+
+USER_IDENTITY_FIELDS = ("user_id", "username", "email", "role", "is_active", "registration_date")
+USER_IDENTITY_CACHE_TTL_SECONDS = float(os.getenv("USER_IDENTITY_CACHE_TTL_SECONDS", "30"))
+USER_IDENTITY_CACHE_SIZE = int(os.getenv("USER_IDENTITY_CACHE_SIZE", "10000"))
+USER_INVALIDATION_CHANNEL = "user_invalidation"
+
+user_identity_cache = TTLCache(maxsize=USER_IDENTITY_CACHE_SIZE, ttl=USER_IDENTITY_CACHE_TTL_SECONDS)
+_user_identity_stats = {"redis_hits": 0, "redis_misses": 0, "invalidations_received": 0}
 
 def default_serializer(obj):
     if isinstance(obj, datetime.datetime):
@@ -34,12 +139,17 @@ async def init_db_pool(max_retries=5, retry_interval=5):
     for attempt in range(max_retries):
         try:
             logger.info(f"Attempting to create database pool (attempt {attempt + 1}/{max_retries})")
-            pool = await asyncpg.create_pool(**DB_CONFIG)
+            if DATABASE_URL:
+                raw_pool = await asyncpg.create_pool(dsn=DATABASE_URL, **POOL_CONFIG)
+            else:
+                raw_pool = await asyncpg.create_pool(**DB_CONFIG, **POOL_CONFIG)
+            pool = InstrumentedPool(raw_pool, DB_POOL_ACQUIRE_TIMEOUT)
             
             async with pool.acquire() as conn:
                 await conn.fetchval('SELECT 1')
             
             logger.info("Successfully connected to the database")
+            await init_read_pool()
             return pool
         except Exception as e:
             logger.error(f"Failed to initialize database pool (attempt {attempt + 1}): {str(e)}")
@@ -50,12 +160,51 @@ async def init_db_pool(max_retries=5, retry_interval=5):
                 logger.error("Max retries reached, could not initialize database pool")
                 raise
 
+async def init_read_pool():
+    global read_pool
+    if read_pool is not None or not DATABASE_REPLICA_URL:
+        return read_pool
+
+    try:
+        raw_pool = await asyncpg.create_pool(dsn=DATABASE_REPLICA_URL, **POOL_CONFIG)
+        read_pool = InstrumentedPool(raw_pool, DB_POOL_ACQUIRE_TIMEOUT)
+        async with read_pool.acquire() as conn:
+            await conn.fetchval('SELECT 1')
+        logger.info("Successfully connected to the read replica")
+    except Exception as e:
+        logger.error(f"Failed to initialize read replica pool, reads will use the primary: {e}")
+        if read_pool is not None:
+            await read_pool.close()
+        read_pool = None
+    return read_pool
+
 async def close_db_pool():
-    global pool
+    global pool, read_pool
+    if read_pool:
+        await read_pool.close()
+        read_pool = None
     if pool:
         await pool.close()
         pool = None
 
+def get_read_pool() -> InstrumentedPool:
+    """Pool for reads that tolerate replica lag (catalog browsing)."""
+    return read_pool or pool
+
+async def mark_recent_write(user_id: int) -> None:
+    """Pin the user's reads to the primary for READ_YOUR_WRITES_WINDOW_SECONDS."""
+    if read_pool is None or user_id is None:
+        return
+    await redis_client.set(f"recent_write:{user_id}", 1, ex=READ_YOUR_WRITES_WINDOW_SECONDS)
+
+async def get_read_pool_for_user(user_id: Optional[int]) -> InstrumentedPool:
+    """Replica pool unless the user wrote recently and must see their own changes."""
+    if read_pool is None:
+        return pool
+    if user_id is not None and await redis_client.exists(f"recent_write:{user_id}"):
+        return pool
+    return read_pool
+
 async def get_user_by_username(username: str) -> Optional[dict]:
     global pool
     if pool is None:
@@ -74,6 +223,77 @@ async def get_user_by_username(username: str) -> Optional[dict]:
             return user_dict
         return None
 
+async def get_user_identity(username: str) -> Optional[dict]:
+    """Slim user row without the password hash: in-process LRU, then Redis, then Postgres."""
+    global pool
+    identity = user_identity_cache.get(username)
+    if identity is not None:
+        return dict(identity)
+
+    cache_key = f"user_identity:{username}"
+    cached = await redis_client.get(cache_key)
+    if cached:
+        _user_identity_stats["redis_hits"] += 1
+        identity = json.loads(cached)
+    else:
+        _user_identity_stats["redis_misses"] += 1
+        if pool is None:
+            await init_db_pool()
+
+        async with pool.acquire() as conn:
+            user = await conn.fetchrow(
+                f'SELECT {", ".join(USER_IDENTITY_FIELDS)} FROM "Users" WHERE username = $1',
+                username
+            )
+        if not user:
+            return None
+        serialized = json.dumps(dict(user), default=default_serializer)
+        await redis_client.set(cache_key, serialized, ex=3600)
+        identity = json.loads(serialized)
+
+    user_identity_cache.set(username, identity)
+    return dict(identity)
+
+async def invalidate_user(*usernames: str) -> None:
+    usernames = [username for username in usernames if username]
+    if not usernames:
+        return
+    for username in usernames:
+        user_identity_cache.pop(username)
+    await redis_client.delete(*[key for username in usernames for key in (f"user:{username}", f"user_identity:{username}")])
+    await redis_client.publish(USER_INVALIDATION_CHANNEL, json.dumps(usernames))
+
+async def listen_user_invalidations():
+    while True:
+        pubsub = redis_client.pubsub()
+        try:
+            await pubsub.subscribe(USER_INVALIDATION_CHANNEL)
+            # Anything published while we were not subscribed is lost
+            user_identity_cache.clear()
+            async for message in pubsub.listen():
+                if message["type"] != "message":
+                    continue
+                _user_identity_stats["invalidations_received"] += 1
+                for username in json.loads(message["data"]):
+                    user_identity_cache.pop(username)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"User invalidation listener error: {e}")
+            await asyncio.sleep(1)
+        finally:
+            await pubsub.reset()
+
+def pool_stats() -> dict:
+    if pool is None:
+        return {"initialized": False}
+    stats = {"initialized": True, **pool.stats()}
+    stats["replica"] = read_pool.stats() if read_pool is not None else None
+    return stats
+
+def user_identity_cache_stats() -> dict:
+    return {**user_identity_cache.stats(), **_user_identity_stats}
+
 async def create_user(username: str, email: str, hashed_password: str, role: str = "user") -> Optional[dict]:
     global pool
     if pool is None:
@@ -183,8 +403,8 @@ async def update_pending_seller_status(
                 return None
 
             if status == 'approved':
-                await conn.execute(
-                    'UPDATE "Users" SET role = $1 WHERE user_id = $2',
+                username = await conn.fetchval(
+                    'UPDATE "Users" SET role = $1 WHERE user_id = $2 RETURNING username',
                     'seller', seller['user_id']
                 )
                 
@@ -196,7 +416,9 @@ async def update_pending_seller_status(
                     seller['user_id']
                 )
 
-            return dict(updated_seller)
+    if status == 'approved':
+        await invalidate_user(username)
+    return dict(updated_seller)
 
 async def get_pending_seller_by_user_id(user_id: int) -> Optional[dict]:
     global pool
@@ -266,9 +488,12 @@ async def get_pending_admin_by_user_id(user_id: int) -> dict:
 
 async def add_role_to_user(user_id: int, role: str) -> bool:
     async with pool.acquire() as conn:
-        result = await conn.execute(
-            'UPDATE "Users" SET role = $1 WHERE user_id = $2',
+        username = await conn.fetchval(
+            'UPDATE "Users" SET role = $1 WHERE user_id = $2 RETURNING username',
             role, user_id
         )
-        return result == "UPDATE 1"
+    if username is None:
+        return False
+    await invalidate_user(username)
+    return True
 
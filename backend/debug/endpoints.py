@@ -1,5 +1,16 @@
 from fastapi import APIRouter
-from elastic.sync import sync_products_to_elasticsearch, get_all_products
+from elastic.sync import (
+    sync_products_to_elasticsearch,
+    get_all_products,
+    get_bulk_indexer,
+    rollback_product_index,
+    outbox_stats,
+    retry_dead_letters,
+)
+from catalog.search.service import search_cache_stats
+from catalog.search.similar import similar_products_stats
+from catalog.basic.views import view_buffer_stats
+from auth import security
 import db
 
 router = APIRouter(
@@ -21,6 +32,35 @@ async def debug_sync():
         print("Traceback:", traceback.format_exc())
         return {"error": str(e), "type": type(e).__name__}
 
+@router.post("/index/rollback")
+async def debug_rollback_index():
+    try:
+        previous = await rollback_product_index()
+    except Exception as e:
+        return {"error": str(e), "type": type(e).__name__}
+    if previous is None:
+        return {"error": "No retained index to roll back to"}
+    return {"message": f"Alias switched back to {previous} and pinned until the next /debug/sync"}
+
+@router.post("/outbox/retry")
+async def debug_retry_outbox():
+    requeued = await retry_dead_letters()
+    return {"message": f"Requeued {requeued} dead-lettered outbox events"}
+
+@router.get("/metrics")
+async def debug_metrics():
+    return {
+        "db_pool": db.pool_stats(),
+        "password_hashing": security.password_hashing_stats(),
+        "token_revocation_cache": security.revocation_cache.stats(),
+        "user_identity_cache": db.user_identity_cache_stats(),
+        "es_bulk_indexer": get_bulk_indexer().stats(),
+        "product_outbox": await outbox_stats(),
+        "search_cache": search_cache_stats(),
+        "similar_products": similar_products_stats(),
+        "product_views": view_buffer_stats(),
+    }
+
 @router.get("/test-db")
 async def test_db_connection():
     try:
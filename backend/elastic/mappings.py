@@ -1,6 +1,17 @@
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
+import logging
+import re
 
+logger = logging.getLogger(__name__)
+
+# Alias that every reader and writer uses; the physical indices are products_v{n}
 PRODUCT_INDEX_NAME = "products"
+# Bump whenever PRODUCT_MAPPINGS changes so the next sync rebuilds into a new index
+PRODUCT_MAPPING_VERSION = 2
+# Previous physical indices kept around for rollback
+PRODUCT_INDEX_RETAIN = 1
+
+_VERSIONED_INDEX = re.compile(rf"^{PRODUCT_INDEX_NAME}_v(\d+)$")
 
 PRODUCT_MAPPINGS: Dict[str, Any] = {
     "settings": {
@@ -32,6 +43,11 @@ PRODUCT_MAPPINGS: Dict[str, Any] = {
                         "russian_stemmer"
                     ]
                 },
+                "suggest_analyzer": {
+                    "type": "custom",
+                    "tokenizer": "standard",
+                    "filter": ["lowercase"]
+                },
                 "ngram_analyzer": {
                     "type": "custom",
                     "tokenizer": "ngram_tokenizer",
@@ -56,6 +72,7 @@ PRODUCT_MAPPINGS: Dict[str, Any] = {
         }
     },
     "mappings": {
+        "_meta": {"mapping_version": PRODUCT_MAPPING_VERSION},
         "properties": {
             "product_id": {"type": "keyword"},
             "seller_id": {"type": "keyword"},
@@ -68,13 +85,18 @@ PRODUCT_MAPPINGS: Dict[str, Any] = {
                         "type": "text",
                         "analyzer": "ngram_analyzer",
                         "search_analyzer": "russian_custom"
-                    },
-                    "completion": {
-                        "type": "completion",
-                        "analyzer": "russian_custom"
                     }
                 }
             },
+            # Autocomplete: inputs and contexts are built in elastic.sync.build_product_document
+            "product_suggest": {
+                "type": "completion",
+                "analyzer": "suggest_analyzer",
+                "contexts": [
+                    {"name": "status", "type": "category"},
+                    {"name": "category", "type": "category"}
+                ]
+            },
             "description": {
                 "type": "text",
                 "analyzer": "russian_custom"
@@ -101,11 +123,76 @@ PRODUCT_MAPPINGS: Dict[str, Any] = {
     }
 }
 
-async def create_product_index(client):
-    if await client.indices.exists(index=PRODUCT_INDEX_NAME):
-        await client.indices.delete(index=PRODUCT_INDEX_NAME)
-    await client.indices.create(
-        index=PRODUCT_INDEX_NAME,
-        mappings=PRODUCT_MAPPINGS["mappings"],
-        settings=PRODUCT_MAPPINGS["settings"]
+async def get_versioned_indices(client) -> List[str]:
+    """Physical product indices, oldest first."""
+    response = await client.indices.get(index=f"{PRODUCT_INDEX_NAME}_v*", ignore_unavailable=True)
+    names = [name for name in response if _VERSIONED_INDEX.match(name)]
+    return sorted(names, key=lambda name: int(_VERSIONED_INDEX.match(name).group(1)))
+
+async def get_live_index(client) -> Optional[str]:
+    """Physical index the alias currently points to."""
+    if not await client.indices.exists_alias(name=PRODUCT_INDEX_NAME):
+        return None
+    response = await client.indices.get_alias(name=PRODUCT_INDEX_NAME)
+    return next(iter(response), None)
+
+async def product_index_needs_rebuild(client) -> bool:
+    """True when there is no alias yet or the live index has an older mapping version."""
+    live_index = await get_live_index(client)
+    if live_index is None:
+        return True
+    response = await client.indices.get_mapping(index=live_index)
+    meta = response[live_index]["mappings"].get("_meta", {})
+    return meta.get("mapping_version") != PRODUCT_MAPPING_VERSION
+
+async def create_versioned_index(client) -> str:
+    """Create the next products_v{n} tuned for bulk loading (no refresh, no replicas)."""
+    existing = await get_versioned_indices(client)
+    version = int(_VERSIONED_INDEX.match(existing[-1]).group(1)) + 1 if existing else 1
+    name = f"{PRODUCT_INDEX_NAME}_v{version}"
+
+    settings = {**PRODUCT_MAPPINGS["settings"], "number_of_replicas": 0, "refresh_interval": "-1"}
+    await client.indices.create(index=name, mappings=PRODUCT_MAPPINGS["mappings"], settings=settings)
+    return name
+
+async def finalize_versioned_index(client, name: str):
+    """Restore serving settings after a bulk load and make the documents visible."""
+    await client.indices.put_settings(
+        index=name,
+        settings={
+            "number_of_replicas": PRODUCT_MAPPINGS["settings"]["number_of_replicas"],
+            "refresh_interval": None,
+        }
     )
+    await client.indices.refresh(index=name)
+
+async def swap_product_alias(client, new_index: str) -> Optional[str]:
+    """Atomically point the alias at new_index and return the previously live index."""
+    previous = await get_live_index(client)
+    actions = []
+    if previous is not None:
+        actions.append({"remove": {"index": previous, "alias": PRODUCT_INDEX_NAME}})
+    elif await client.indices.exists(index=PRODUCT_INDEX_NAME):
+        # Pre-alias deployments have a concrete index under the alias name
+        actions.append({"remove_index": {"index": PRODUCT_INDEX_NAME}})
+    actions.append({"add": {"index": new_index, "alias": PRODUCT_INDEX_NAME}})
+
+    await client.indices.update_aliases(actions=actions)
+    logger.info(f"Alias {PRODUCT_INDEX_NAME} now points to {new_index} (was {previous})")
+    return previous
+
+async def prune_versioned_indices(client):
+    """Drop old physical indices beyond the rollback window."""
+    live_index = await get_live_index(client)
+    retired = [name for name in await get_versioned_indices(client) if name != live_index]
+    for name in retired[:-PRODUCT_INDEX_RETAIN] if PRODUCT_INDEX_RETAIN else retired:
+        await client.indices.delete(index=name)
+        logger.info(f"Deleted retired index {name}")
+
+async def get_rollback_index(client) -> Optional[str]:
+    """Newest retained index older than the live one (see elastic.sync.rollback_product_index)."""
+    live_index = await get_live_index(client)
+    indices = await get_versioned_indices(client)
+    if live_index not in indices or indices.index(live_index) == 0:
+        return None
+    return indices[indices.index(live_index) - 1]
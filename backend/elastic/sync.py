@@ -1,145 +1,742 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, AsyncIterator, List, Optional, Set, Tuple
 import asyncio
-from datetime import datetime
+from redis.exceptions import RedisError
+from functools import lru_cache
 import logging
+import os
+import time
+import uuid
 import db
 from elastic.client import get_elasticsearch_client
-from elastic.mappings import PRODUCT_INDEX_NAME
+from elastic.mappings import (
+    PRODUCT_INDEX_NAME,
+    product_index_needs_rebuild,
+    create_versioned_index,
+    finalize_versioned_index,
+    get_live_index,
+    get_rollback_index,
+    swap_product_alias,
+    prune_versioned_indices,
+)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+SYNC_INTERVAL_SECONDS = float(os.getenv("ES_SYNC_INTERVAL_SECONDS", "1"))
+SYNC_CHUNK_SIZE = int(os.getenv("ES_SYNC_CHUNK_SIZE", "500"))
+# Must match the partial indexes idx_product_outbox_pending and idx_product_outbox_dead
+OUTBOX_MAX_ATTEMPTS = 5
+# How long a drainer holds its claim on a batch; a crashed worker's batch is picked up after this
+OUTBOX_CLAIM_SECONDS = int(os.getenv("ES_OUTBOX_CLAIM_SECONDS", "300"))
+# Upper bound for the pause between drains while Elasticsearch keeps failing
+DRAIN_BACKOFF_MAX_SECONDS = float(os.getenv("ES_DRAIN_BACKOFF_MAX_SECONDS", "30"))
+# Concurrent _bulk requests during a full load; also bounds the chunks held in memory
+REBUILD_BULK_WORKERS = int(os.getenv("ES_REBUILD_BULK_WORKERS", "4"))
+REBUILD_PROGRESS_INTERVAL_SECONDS = 5.0
+BULK_FLUSH_INTERVAL_SECONDS = float(os.getenv("ES_BULK_FLUSH_INTERVAL_SECONDS", "0.5"))
+BULK_MAX_RETRIES = int(os.getenv("ES_BULK_MAX_RETRIES", "3"))
+BULK_RETRY_BACKOFF_SECONDS = 0.5
+# Item statuses worth retrying: rejected by a full write queue or a transient shard problem
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+REBUILD_LOCK_KEY = "es_sync:rebuild_lock"
+SUGGEST_MAX_INPUTS = 5
+# Part of every search cache key; bumping it orphans all cached search results
+SEARCH_GENERATION_KEY = "search:generation"
+# Writes without wait_for become searchable on the next refresh (index.refresh_interval, 1s by default)
+SEARCH_VISIBLE_DELAY_SECONDS = float(os.getenv("ES_SEARCH_VISIBLE_DELAY_SECONDS", "1.5"))
+# Products whose precomputed similar-products list needs recomputing
+SIMILAR_DIRTY_KEY = "similar_products:dirty"
+# Short lease renewed while a rebuild runs; a crashed worker pauses syncing for at most this long
+REBUILD_LOCK_TTL_SECONDS = int(os.getenv("ES_REBUILD_LOCK_TTL_SECONDS", "30"))
+# Index a rollback pinned the alias to; the mapping-version rebuild is skipped while it is live
+PINNED_INDEX_KEY = "es_sync:pinned_index"
+
+_RENEW_IF_OWNER = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('expire', KEYS[1], ARGV[2]) end return 0"
+_RELEASE_IF_OWNER = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+PRODUCT_SELECT = """
+    SELECT
+        p.product_id,
+        p.seller_id,
+        p.product_name,
+        p.description,
+        p.category,
+        p.price,
+        p.in_stock,
+        p.status,
+        u.username AS seller_name,
+        p.avg_rating
+    FROM "Products" p
+    JOIN "Sellers" s ON p.seller_id = s.seller_id
+    JOIN "Users" u ON s.user_id = u.user_id
+"""
+
+async def bump_search_generation():
+    try:
+        await db.redis_client.incr(SEARCH_GENERATION_KEY)
+    except RedisError as e:
+        logger.error(f"Redis error while bumping search generation: {e}")
+
+async def mark_similar_dirty(product_ids):
+    try:
+        await db.redis_client.sadd(SIMILAR_DIRTY_KEY, *[str(product_id) for product_id in product_ids])
+    except RedisError as e:
+        logger.error(f"Redis error while marking similar products dirty: {e}")
+
+def build_suggest_field(product: Dict[str, Any]) -> Dict[str, Any]:
+    """Completion inputs for the name and each later word in it, so "iph" finds "Apple iPhone" too."""
+    words = product['product_name'].split()
+    inputs = [" ".join(words[i:]) for i in range(min(len(words), SUGGEST_MAX_INPUTS))]
+    sellable = product['status'] == 'available' and (product['in_stock'] or 0) > 0
+    return {
+        "input": inputs,
+        "weight": int((product['avg_rating'] or 0) * 20) + 1,
+        "contexts": {
+            "status": ["available" if sellable else "unavailable"],
+            "category": [product['category']],
+        },
+    }
+
+def build_product_document(row) -> Dict[str, Any]:
+    product = dict(row)
+    product['product_id'] = str(product['product_id'])
+    product['seller_id'] = str(product['seller_id'])
+
+    if product['price'] is not None:
+        product['price'] = float(product['price'])
+
+    if product['avg_rating'] is not None:
+        product['avg_rating'] = float(product['avg_rating'])
+
+    product['product_suggest'] = build_suggest_field(product)
+    return product
+
 async def get_all_products() -> List[Dict[str, Any]]:
     try:
         await db.init_db_pool()
-        
+
         async with db.pool.acquire() as conn:
-            query = """
-                SELECT 
-                    p.product_id,
-                    p.seller_id,
-                    p.product_name,
-                    p.description,
-                    p.category,
-                    p.price,
-                    p.in_stock,
-                    p.status,
-                    u.username AS seller_name,
-                    ROUND(AVG(c.rating)::numeric, 2) AS avg_rating
-                FROM "Products" p
-                JOIN "Sellers" s ON p.seller_id = s.seller_id
-                JOIN "Users" u ON s.user_id = u.user_id
-                LEFT JOIN "Comments" c ON p.product_id = c.product_id
-                GROUP BY p.product_id, u.username
-            """
-            rows = await conn.fetch(query)
+            rows = await conn.fetch(PRODUCT_SELECT)
             return [dict(row) for row in rows]
     except Exception as e:
         logger.error(f"Error in get_all_products: {e}")
         raise
 
-async def sync_products_to_elasticsearch():
-    logger.info("Starting synchronization process...")
-    
-    try:
-        await db.init_db_pool()
-        
+async def _bulk(es, operations: List[Dict[str, Any]]) -> Set[str]:
+    """Send one _bulk request and return the ids of documents that failed."""
+    failed = set()
+    response = await es.bulk(operations=operations)
+    if response.get("errors"):
+        for item in response["items"]:
+            action, result = next(iter(item.items()))
+            if action == "delete" and result.get("status") == 404:
+                continue
+            if "error" in result:
+                failed.add(result["_id"])
+                logger.error(f"Error on {action} of document {result['_id']}: {result['error']}")
+    return failed
+
+class BulkIndexError(Exception):
+    """transient: the write gave up on retryable errors (request failure, 429, 5xx), not on the document."""
+
+    def __init__(self, doc_id: str, error: Any, transient: bool = False):
+        super().__init__(f"Indexing of document {doc_id} failed: {error}")
+        self.doc_id = doc_id
+        self.error = error
+        self.transient = transient
+
+class OutboxDrainDeferred(Exception):
+    """Elasticsearch failed transiently; the affected events stay pending without using up an attempt."""
+
+class _BulkOp:
+    __slots__ = ("action", "index", "doc_id", "document", "wait_for", "future", "attempts")
+
+    def __init__(self, action, index, doc_id, document, wait_for, future):
+        self.action = action
+        self.index = index
+        self.doc_id = doc_id
+        self.document = document
+        self.wait_for = wait_for
+        self.future = future
+        self.attempts = 0
+
+class BulkIndexer:
+    """Queues single-document writes and sends them to Elasticsearch through _bulk.
+
+    A batch is flushed once it reaches max_batch operations or flush_interval
+    seconds after its first operation was queued. Every submit returns a
+    future that resolves with the item result or fails with BulkIndexError;
+    items rejected with a retryable status are re-queued with backoff.
+    Writes are not refreshed unless a caller asks for wait_for, in which case
+    its batch uses refresh=wait_for and resolves once the change is searchable.
+    The search generation is bumped only once a change is searchable: right
+    away for a wait_for batch, otherwise after the refresh interval, so a
+    search racing the refresh cannot cache the old results under the new
+    generation.
+    """
+
+    def __init__(
+        self,
+        max_batch: int = SYNC_CHUNK_SIZE,
+        flush_interval: float = BULK_FLUSH_INTERVAL_SECONDS,
+        max_retries: int = BULK_MAX_RETRIES
+    ):
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self._pending: List[_BulkOp] = []
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._bump_task: Optional[asyncio.Task] = None
+        self._bump_due = 0.0
+        self._stats = {"flushes": 0, "indexed": 0, "deleted": 0, "retried": 0, "failed": 0}
+
+    def stats(self) -> dict:
+        return {**self._stats, "pending": len(self._pending)}
+
+    def submit_upsert(self, document: Dict[str, Any], index: str = PRODUCT_INDEX_NAME, wait_for: bool = False) -> asyncio.Future:
+        return self._submit("index", index, str(document["product_id"]), document, wait_for)
+
+    def submit_delete(self, product_id, index: str = PRODUCT_INDEX_NAME, wait_for: bool = False) -> asyncio.Future:
+        return self._submit("delete", index, str(product_id), None, wait_for)
+
+    async def upsert(self, document: Dict[str, Any], index: str = PRODUCT_INDEX_NAME, wait_for: bool = False):
+        return await self.submit_upsert(document, index, wait_for)
+
+    async def delete(self, product_id, index: str = PRODUCT_INDEX_NAME, wait_for: bool = False):
+        return await self.submit_delete(product_id, index, wait_for)
+
+    def _submit(self, action, index, doc_id, document, wait_for) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._queue(_BulkOp(action, index, doc_id, document, wait_for, future))
+        return future
+
+    def _queue(self, op: _BulkOp):
+        self._pending.append(op)
+        if len(self._pending) >= self.max_batch or op.wait_for:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.flush_interval, self._start_flush)
+
+    def _start_flush(self):
+        task = asyncio.create_task(self.flush())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def flush(self):
+        async with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            while self._pending:
+                batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+                await self._send(batch)
+
+    async def close(self):
+        await self.flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._bump_task is not None:
+            await self._bump_task
+
+    def _schedule_generation_bump(self):
+        self._bump_due = time.monotonic() + SEARCH_VISIBLE_DELAY_SECONDS
+        if self._bump_task is None:
+            self._bump_task = asyncio.create_task(self._bump_when_searchable())
+
+    async def _bump_when_searchable(self):
+        """Bump once the latest unrefreshed write is searchable; at most once per delay under load."""
+        try:
+            due = self._bump_due
+            while True:
+                await asyncio.sleep(max(0.0, due - time.monotonic()))
+                await bump_search_generation()
+                if self._bump_due <= due:
+                    return
+                # More writes since; cover them without bumping more than once per delay
+                due = max(self._bump_due, time.monotonic() + SEARCH_VISIBLE_DELAY_SECONDS)
+        finally:
+            self._bump_task = None
+
+    async def _send(self, batch: List[_BulkOp]):
+        operations = []
+        for op in batch:
+            operations.append({op.action: {"_index": op.index, "_id": op.doc_id}})
+            if op.document is not None:
+                operations.append(op.document)
+
         es_client = get_elasticsearch_client()
         await es_client.initialize()
-        logger.info("Elasticsearch client initialized")
-        
-        from elastic.mappings import create_product_index
-        await create_product_index(es_client.get_client())
-        logger.info("Index mapping created/updated")
+        self._stats["flushes"] += 1
+        wait_for = any(op.wait_for for op in batch)
+        try:
+            response = await es_client.get_client().bulk(
+                operations=operations,
+                refresh="wait_for" if wait_for else False
+            )
+        except Exception as e:
+            logger.error(f"Bulk request with {len(batch)} operations failed: {e}")
+            for op in batch:
+                self._retry_or_fail(op, e)
+            return
 
-        logger.info("Fetching products from PostgreSQL...")
-        products = await get_all_products()
-        logger.info(f"Found {len(products)} products in PostgreSQL")
+        succeeded = []
+        for op, item in zip(batch, response["items"]):
+            result = next(iter(item.values()))
+            status = result.get("status", 500)
+            if "error" not in result or (op.action == "delete" and status == 404):
+                self._stats["indexed" if op.action == "index" else "deleted"] += 1
+                succeeded.append((op, result))
+            elif status in RETRYABLE_STATUSES:
+                self._retry_or_fail(op, result["error"])
+            else:
+                self._fail(op, result["error"])
 
-        operations = []
-        for product in products:
-            product['product_id'] = str(product['product_id'])
-            product['seller_id'] = str(product['seller_id'])
-            
-            if product['price'] is not None:
-                product['price'] = float(product['price'])
-            
-            if product['avg_rating'] is not None:
-                product['avg_rating'] = float(product['avg_rating'])
-
-            operations.extend([
-                {"index": {"_index": PRODUCT_INDEX_NAME, "_id": product['product_id']}},
-                product
-            ])
+        if succeeded and wait_for:
+            # Already searchable; bump before resolving so the caller never reads a stale cached search
+            await bump_search_generation()
+        elif succeeded:
+            self._schedule_generation_bump()
+        for op, result in succeeded:
+            if not op.future.done():
+                op.future.set_result(result)
+
+    def _retry_or_fail(self, op: _BulkOp, error: Any):
+        if op.attempts >= self.max_retries:
+            self._fail(op, error, transient=True)
+            return
+        op.attempts += 1
+        self._stats["retried"] += 1
+        asyncio.get_running_loop().call_later(BULK_RETRY_BACKOFF_SECONDS * op.attempts, self._queue, op)
+
+    def _fail(self, op: _BulkOp, error: Any, transient: bool = False):
+        self._stats["failed"] += 1
+        logger.error(f"Error on {op.action} of document {op.doc_id}: {error}")
+        if not op.future.done():
+            op.future.set_exception(BulkIndexError(op.doc_id, error, transient))
 
+@lru_cache()
+def get_bulk_indexer() -> BulkIndexer:
+    return BulkIndexer()
+
+class RebuildLease:
+    """REBUILD_LOCK_KEY held with a short TTL that is renewed in the background.
+
+    Outbox draining pauses while the key exists, so a worker that dies in the
+    middle of a rebuild holds index updates up for one TTL, not for the
+    whole rebuild.
+    """
+
+    def __init__(self):
+        self.token = uuid.uuid4().hex
+        self.lost = False
+        self._renewer: Optional[asyncio.Task] = None
+
+    async def acquire(self) -> bool:
+        if not await db.redis_client.set(REBUILD_LOCK_KEY, self.token, nx=True, ex=REBUILD_LOCK_TTL_SECONDS):
+            return False
+        self._renewer = asyncio.create_task(self._renew())
+        return True
+
+    async def _renew(self):
+        while True:
+            await asyncio.sleep(REBUILD_LOCK_TTL_SECONDS / 3)
+            try:
+                renewed = await db.redis_client.eval(
+                    _RENEW_IF_OWNER, 1, REBUILD_LOCK_KEY, self.token, REBUILD_LOCK_TTL_SECONDS
+                )
+            except RedisError as e:
+                logger.error(f"Redis error while renewing the rebuild lock: {e}")
+                continue
+            if not renewed:
+                self.lost = True
+                logger.error("Product index rebuild lock expired while held")
+                return
+
+    def check(self):
+        """Raise if another worker may have taken the lock over; call before touching the alias."""
+        if self.lost:
+            raise RuntimeError("Lost the product index rebuild lock")
+
+    async def release(self):
+        if self._renewer is not None:
+            self._renewer.cancel()
+        await db.redis_client.eval(_RELEASE_IF_OWNER, 1, REBUILD_LOCK_KEY, self.token)
+
+async def iter_product_documents(conn) -> AsyncIterator[Dict[str, Any]]:
+    """Stream search documents through a server-side cursor (needs an open transaction)."""
+    async for row in conn.cursor(PRODUCT_SELECT + " ORDER BY p.product_id", prefetch=SYNC_CHUNK_SIZE):
+        yield build_product_document(row)
+
+async def _bulk_with_retry(es, operations: List[Dict[str, Any]]) -> Set[str]:
+    for attempt in range(BULK_MAX_RETRIES + 1):
+        try:
+            return await _bulk(es, operations)
+        except Exception as e:
+            if attempt == BULK_MAX_RETRIES:
+                raise
+            logger.warning(f"Bulk request failed, retrying ({attempt + 1}/{BULK_MAX_RETRIES}): {e}")
+            await asyncio.sleep(BULK_RETRY_BACKOFF_SECONDS * (attempt + 1))
+
+async def load_all_products(index: str) -> Tuple[int, int]:
+    """Stream every product into `index` and return (products in snapshot, documents indexed).
+
+    Rows come from a server-side cursor inside a repeatable-read snapshot and
+    are cut into SYNC_CHUNK_SIZE chunks. REBUILD_BULK_WORKERS send them in
+    parallel, and the queue between them holds at most that many chunks, so
+    memory stays flat regardless of catalog size.
+    """
+    await db.init_db_pool()
+    es_client = get_elasticsearch_client()
+    await es_client.initialize()
+    es = es_client.get_client()
+
+    chunks: asyncio.Queue = asyncio.Queue(maxsize=REBUILD_BULK_WORKERS)
+    progress = {"indexed": 0, "failed": 0, "expected": 0}
+    started = time.monotonic()
+    last_report = started
+
+    def report(final: bool = False):
+        nonlocal last_report
+        now = time.monotonic()
+        if not final and now - last_report < REBUILD_PROGRESS_INTERVAL_SECONDS:
+            return
+        last_report = now
+        rate = progress["indexed"] / max(now - started, 1e-6)
+        logger.info(
+            f"{index}: {progress['indexed']}/{progress['expected']} products indexed, "
+            f"{progress['failed']} failed ({rate:.0f} docs/s)"
+        )
+
+    async def worker():
+        while True:
+            chunk = await chunks.get()
+            if chunk is None:
+                return
+            operations = []
+            for document in chunk:
+                operations.extend([
+                    {"index": {"_index": index, "_id": document['product_id']}},
+                    document
+                ])
+            try:
+                failed = await _bulk_with_retry(es, operations)
+            except Exception as e:
+                logger.error(f"Dropping chunk of {len(chunk)} products for {index}: {e}")
+                failed = chunk
+            progress["failed"] += len(failed)
+            progress["indexed"] += len(chunk) - len(failed)
+            report()
+
+    workers = [asyncio.create_task(worker()) for _ in range(REBUILD_BULK_WORKERS)]
+    try:
+        async with db.pool.acquire() as conn:
+            async with conn.transaction(isolation="repeatable_read", readonly=True):
+                progress["expected"] = await conn.fetchval(f"SELECT COUNT(*) FROM ({PRODUCT_SELECT}) products")
+                chunk = []
+                async for document in iter_product_documents(conn):
+                    chunk.append(document)
+                    if len(chunk) >= SYNC_CHUNK_SIZE:
+                        await chunks.put(chunk)
+                        chunk = []
+                if chunk:
+                    await chunks.put(chunk)
+        for _ in workers:
+            await chunks.put(None)
+        await asyncio.gather(*workers)
+    finally:
+        for task in workers:
+            task.cancel()
+
+    report(final=True)
+    return progress["expected"], progress["indexed"]
+
+async def drain_product_outbox() -> int:
+    """Apply pending outbox events to the index; returns how many events were consumed.
+
+    Each batch is leased in a short transaction (claimed_until, taken with
+    SKIP LOCKED) so several workers can drain side by side, indexed with no
+    transaction or row lock held, and settled in a second short transaction.
+    A lease left behind by a crashed worker expires after
+    OUTBOX_CLAIM_SECONDS. Events are coalesced per product and documents are
+    rebuilt from the current row, so a burst of updates costs one index
+    operation. Only a document Elasticsearch rejects outright uses up an
+    attempt; after OUTBOX_MAX_ATTEMPTS its events are dead letters (see
+    outbox_stats). When writes fail transiently their leases are released
+    and OutboxDrainDeferred is raised so the caller backs off.
+    """
+    await db.init_db_pool()
+    indexer = get_bulk_indexer()
+
+    consumed = 0
+    while True:
+        async with db.pool.acquire() as conn:
+            events = await conn.fetch(
+                '''
+                UPDATE "Product_outbox"
+                SET claimed_until = now() + make_interval(secs => $3)
+                WHERE id IN (
+                    SELECT id
+                    FROM "Product_outbox"
+                    WHERE attempts < $1
+                      AND (claimed_until IS NULL OR claimed_until < now())
+                    ORDER BY id
+                    LIMIT $2
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id, product_id, operation
+                ''',
+                OUTBOX_MAX_ATTEMPTS, SYNC_CHUNK_SIZE, OUTBOX_CLAIM_SECONDS
+            )
+            if not events:
+                return consumed
+
+            events = sorted(events, key=lambda event: event["id"])
+            latest = {}
+            for event in events:
+                latest[event["product_id"]] = event["operation"]
+            upsert_ids = [product_id for product_id, operation in latest.items() if operation == "upsert"]
+            rows = await conn.fetch(
+                PRODUCT_SELECT + " WHERE p.product_id = ANY($1::int[])",
+                upsert_ids
+            ) if upsert_ids else []
+
+        found = set()
+        futures = []
+        for row in rows:
+            found.add(row["product_id"])
+            futures.append(indexer.submit_upsert(build_product_document(row)))
+        # Upserts whose row is already gone were followed by a delete
+        for product_id in latest:
+            if product_id not in found:
+                futures.append(indexer.submit_delete(product_id))
+
+        await indexer.flush()
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        errors = [result for result in results if isinstance(result, BulkIndexError)]
+        failed = {error.doc_id for error in errors}
+        rejected = {error.doc_id for error in errors if not error.transient}
+
+        done = [event["id"] for event in events if str(event["product_id"]) not in failed]
+        retry = [event["id"] for event in events if str(event["product_id"]) in rejected]
+        deferred = [event["id"] for event in events if str(event["product_id"]) in failed - rejected]
+        async with db.pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute('DELETE FROM "Product_outbox" WHERE id = ANY($1::bigint[])', done)
+                if retry:
+                    await conn.execute(
+                        'UPDATE "Product_outbox" SET attempts = attempts + 1, claimed_until = NULL WHERE id = ANY($1::bigint[])',
+                        retry
+                    )
+                if deferred:
+                    await conn.execute(
+                        'UPDATE "Product_outbox" SET claimed_until = NULL WHERE id = ANY($1::bigint[])',
+                        deferred
+                    )
+        consumed += len(done)
+        changed = {product_id for product_id in latest if str(product_id) not in failed}
+        if changed:
+            await mark_similar_dirty(changed)
+        if deferred:
+            raise OutboxDrainDeferred(
+                f"{len(failed) - len(rejected)} products deferred after transient Elasticsearch errors"
+            )
+        if len(events) < SYNC_CHUNK_SIZE:
+            return consumed
+
+async def outbox_stats() -> dict:
+    async with db.pool.acquire() as conn:
+        # Literal bounds so each count is answered from its partial index
+        row = await conn.fetchrow(
+            f'''
+            SELECT
+                (SELECT COUNT(*) FROM "Product_outbox" WHERE attempts < {OUTBOX_MAX_ATTEMPTS}) AS pending,
+                (SELECT COUNT(*) FROM "Product_outbox" WHERE attempts >= {OUTBOX_MAX_ATTEMPTS}) AS dead_letters
+            '''
+        )
+    return {**dict(row), "max_attempts": OUTBOX_MAX_ATTEMPTS}
+
+async def retry_dead_letters() -> int:
+    """Give dead-lettered outbox events a fresh set of attempts; returns how many."""
+    async with db.pool.acquire() as conn:
+        result = await conn.execute(
+            'UPDATE "Product_outbox" SET attempts = 0, claimed_until = NULL WHERE attempts >= $1',
+            OUTBOX_MAX_ATTEMPTS
+        )
+    return int(result.split()[-1])
+
+async def rebuild_product_index() -> Optional[str]:
+    """Load every product into a new products_v{n} and swap the alias onto it.
+
+    The live index keeps serving searches until the swap. Outbox draining is
+    paused while the rebuild lock is held, so writes made during the load are
+    applied to the new index right after the swap. Returns the new index
+    name, or None if another worker holds the rebuild lock.
+    """
+    await db.init_db_pool()
+    es_client = get_elasticsearch_client()
+    await es_client.initialize()
+    es = es_client.get_client()
+
+    lease = RebuildLease()
+    if not await lease.acquire():
+        logger.info("Product index rebuild already in progress")
+        return None
+
+    try:
+        new_index = await create_versioned_index(es)
+        logger.info(f"Rebuilding products into {new_index}")
+        try:
+            expected, _ = await load_all_products(new_index)
+            await finalize_versioned_index(es, new_index)
+
+            # Outbox draining is paused, so the index holds exactly the snapshot
+            indexed = (await es.count(index=new_index))["count"]
+            if indexed < expected:
+                raise RuntimeError(f"{new_index} has {indexed} documents, expected {expected}")
+        except Exception:
+            await es.indices.delete(index=new_index, ignore_unavailable=True)
+            raise
+
+        lease.check()
+        await swap_product_alias(es, new_index)
+        # A fresh index carries the current mapping, so any rollback pin is obsolete
+        await db.redis_client.delete(PINNED_INDEX_KEY)
+        await bump_search_generation()
+        await prune_versioned_indices(es)
+        return new_index
+    finally:
+        await lease.release()
+
+async def prune_deleted_products(es, index: str) -> int:
+    """Delete documents from index whose product no longer exists; returns how many."""
+    pruned = 0
+    search_after = None
+    while True:
+        response = await es.search(
+            index=index,
+            query={"match_all": {}},
+            sort=[{"product_id": "asc"}],
+            search_after=search_after,
+            size=SYNC_CHUNK_SIZE,
+            source=False
+        )
+        hits = response["hits"]["hits"]
+        if not hits:
+            return pruned
+        search_after = hits[-1]["sort"]
+
+        doc_ids = [int(hit["_id"]) for hit in hits]
+        async with db.pool.acquire() as conn:
+            rows = await conn.fetch('SELECT product_id FROM "Products" WHERE product_id = ANY($1::int[])', doc_ids)
+        existing = {row["product_id"] for row in rows}
+        operations = [{"delete": {"_index": index, "_id": str(doc_id)}} for doc_id in doc_ids if doc_id not in existing]
         if operations:
-            logger.info(f"Starting bulk indexing of {len(products)} products...")
-            response = await es_client.get_client().bulk(body=operations, refresh=True)
-            
-            if response.get("errors"):
-                logger.error("Errors during bulk indexing:")
-                for item in response["items"]:
-                    if "error" in item["index"]:
-                        logger.error(f"Error indexing document {item['index']['_id']}: {item['index']['error']}")
-            else:
-                logger.info(f"Successfully synchronized {len(products)} products to Elasticsearch")
+            await _bulk_with_retry(es, operations)
+            pruned += len(operations)
+
+async def pinned_index_is_live(es) -> bool:
+    pinned = await db.redis_client.get(PINNED_INDEX_KEY)
+    return pinned is not None and pinned == await get_live_index(es)
+
+async def rollback_product_index() -> Optional[str]:
+    """Bring the newest retained index up to date, swap the alias back to it and pin it there.
+
+    The retained index missed every write made since it was swapped out, so
+    it is reloaded from Postgres and cleared of deleted products first;
+    outbox draining is paused meanwhile and catches up right after. The pin
+    keeps run_incremental_sync from rebuilding over its older mapping
+    version until a full sync replaces it. Returns the index now live, or
+    None if there is nothing to roll back to.
+    """
+    await db.init_db_pool()
+    es_client = get_elasticsearch_client()
+    await es_client.initialize()
+    es = es_client.get_client()
+
+    previous = await get_rollback_index(es)
+    if previous is None:
+        return None
+
+    lease = RebuildLease()
+    if not await lease.acquire():
+        raise RuntimeError("Product index rebuild in progress")
+    try:
+        logger.info(f"Re-syncing {previous} before rolling back to it")
+        await load_all_products(previous)
+        pruned = await prune_deleted_products(es, previous)
+        await es.indices.refresh(index=previous)
+        logger.info(f"{previous} re-synced, {pruned} deleted products removed")
+
+        lease.check()
+        await db.redis_client.set(PINNED_INDEX_KEY, previous)
+        await swap_product_alias(es, previous)
+        await bump_search_generation()
+        return previous
+    finally:
+        await lease.release()
+
+async def run_incremental_sync():
+    """Background loop that keeps the search index in step with Postgres.
+
+    While Elasticsearch keeps failing, the pause between rounds doubles up to
+    DRAIN_BACKOFF_MAX_SECONDS, so an outage is waited out rather than hammered.
+    """
+    delay = SYNC_INTERVAL_SECONDS
+    while True:
+        try:
+            es_client = get_elasticsearch_client()
+            await es_client.initialize()
+            es = es_client.get_client()
+            waiting_for_rebuild = False
+            # A rolled-back index stays live on purpose, whatever its mapping version
+            if await product_index_needs_rebuild(es) and not await pinned_index_is_live(es):
+                waiting_for_rebuild = await rebuild_product_index() is None
+            # Leave the outbox alone while a rebuild is loading (here or in another worker)
+            if waiting_for_rebuild or await db.redis_client.exists(REBUILD_LOCK_KEY):
+                await asyncio.sleep(SYNC_INTERVAL_SECONDS)
+                continue
+
+            consumed = await drain_product_outbox()
+            if consumed:
+                logger.info(f"Applied {consumed} product outbox events to Elasticsearch")
+            delay = SYNC_INTERVAL_SECONDS
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Incremental Elasticsearch sync failed, next attempt in {delay:.0f}s: {e}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, DRAIN_BACKOFF_MAX_SECONDS)
+            continue
+        await asyncio.sleep(SYNC_INTERVAL_SECONDS)
+
+async def sync_products_to_elasticsearch():
+    """Full resync into a fresh index version, swapped in without a search outage."""
+    logger.info("Starting synchronization process...")
+
+    try:
+        new_index = await rebuild_product_index()
+        if new_index:
+            logger.info(f"Successfully synchronized products to Elasticsearch ({new_index})")
     except Exception as e:
         logger.error(f"Error in sync_products_to_elasticsearch: {e}")
         raise
 
-async def sync_product_to_elasticsearch(product_id: str):
+async def sync_product_to_elasticsearch(product_id: int, wait_for: bool = False):
+    """Queue an upsert of one product; wait_for=True returns once it is searchable."""
     try:
         await db.init_db_pool()
         async with db.pool.acquire() as conn:
-            query = """
-                SELECT 
-                    p.product_id,
-                    p.seller_id,
-                    p.product_name,
-                    p.description,
-                    p.category,
-                    p.price,
-                    p.in_stock,
-                    p.status,
-                    u.username AS seller_name,
-                    ROUND(AVG(c.rating)::numeric, 2) AS avg_rating
-                FROM "Products" p
-                JOIN "Sellers" s ON p.seller_id = s.seller_id
-                JOIN "Users" u ON s.user_id = u.user_id
-                LEFT JOIN "Comments" c ON p.product_id = c.product_id
-                WHERE p.product_id = $1
-                GROUP BY p.product_id, u.username
-            """
-            row = await conn.fetchrow(query, product_id)
-            if row:
-                product = dict(row)
-                
-                product['product_id'] = str(product['product_id'])
-                product['seller_id'] = str(product['seller_id'])
-                
-                if product['price'] is not None:
-                    product['price'] = float(product['price'])
-
-                es_client = get_elasticsearch_client()
-                await es_client.initialize()
-                await es_client.get_client().index(
-                    index=PRODUCT_INDEX_NAME,
-                    id=product['product_id'],
-                    document=product,
-                    refresh=True
-                )
+            row = await conn.fetchrow(PRODUCT_SELECT + " WHERE p.product_id = $1", int(product_id))
+        if row:
+            await get_bulk_indexer().upsert(build_product_document(row), wait_for=wait_for)
     except Exception as e:
         logger.error(f"Error in sync_product_to_elasticsearch: {e}")
         raise
 
-async def delete_product_from_elasticsearch(product_id: str):
-    es_client = get_elasticsearch_client()
-    await es_client.initialize()
+async def delete_product_from_elasticsearch(product_id: int, wait_for: bool = False):
     try:
-        await es_client.get_client().delete(
-            index=PRODUCT_INDEX_NAME,
-            id=product_id,
-            refresh=True
-        )
-    except Exception:
-        pass
+        await get_bulk_indexer().delete(product_id, wait_for=wait_for)
+    except BulkIndexError as e:
+        logger.error(f"Error in delete_product_from_elasticsearch: {e}")
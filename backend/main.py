@@ -1,13 +1,17 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
 import logging
 from auth import router as auth_router, admin_router
 from catalog.basic.products import router as products_router
 from catalog.basic.product import router as product_router
+from catalog.basic.views import run_view_flusher, flush_views
+from catalog.basic.trending import router as trending_router
 from catalog.basic.sellers_categories import router as sellers_categories_router
 from catalog.basic import comments
 from catalog.basic import comments_by_user 
 from catalog.search.endpoints import router as search_router
+from catalog.search.similar import run_similar_products_refresh
 from catalog.admin.products_status import router as products_status_router
 from catalog.admin.ban_user import router as ban_user_router
 from catalog.admin.waiting_products import router as waiting_products_router
@@ -19,8 +23,10 @@ from catalog.client.cart import router as cart_router
 from catalog.client.gambling import router as gambling_router
 from catalog.seller.seller import router as seller_router
 from catalog.seller.etl import router as etl_router
+from catalog.seller.etl_jobs import run_etl_worker, shutdown_parse_pool, ETL_WORKERS
 from elastic.client import get_elasticsearch_client
-from elastic.mappings import create_product_index, PRODUCT_INDEX_NAME
+from elastic.mappings import PRODUCT_INDEX_NAME
+from elastic.sync import run_incremental_sync, get_bulk_indexer
 import db
 
 logging.basicConfig(
@@ -29,6 +35,8 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+background_tasks: list[asyncio.Task] = []
+
 app = FastAPI(
     title="MEOWShop API",
     description="API для MEOWShop",
@@ -64,24 +72,38 @@ async def startup_event():
     except Exception as e:
         logger.error(f"Failed to initialize database pool: {e}")
         raise
+
+    background_tasks.append(asyncio.create_task(db.listen_user_invalidations()))
+    background_tasks.append(asyncio.create_task(run_view_flusher()))
     
     logger.info("Initializing Elasticsearch client...")
     es_client = get_elasticsearch_client()
     await es_client.initialize()
     logger.info("Elasticsearch client initialized")
     
-    logger.info("Creating/updating Elasticsearch index mapping...")
-    await create_product_index(es_client.get_client())
-    logger.info("Index mapping created/updated successfully")
-    
-    logger.info("Starting product synchronization with Elasticsearch...")
-    from elastic.sync import sync_products_to_elasticsearch
-    await sync_products_to_elasticsearch()
-    logger.info("Successfully synchronized products with Elasticsearch")
+    logger.info("Starting incremental product synchronization with Elasticsearch...")
+    background_tasks.append(asyncio.create_task(run_incremental_sync()))
+    background_tasks.append(asyncio.create_task(run_similar_products_refresh()))
+
+    logger.info(f"Starting {ETL_WORKERS} ETL workers...")
+    for _ in range(ETL_WORKERS):
+        background_tasks.append(asyncio.create_task(run_etl_worker()))
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Starting application shutdown...")
+
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
+    shutdown_parse_pool()
+
+    logger.info("Flushing buffered product views...")
+    await flush_views()
+
+    logger.info("Flushing pending Elasticsearch writes...")
+    await get_bulk_indexer().close()
     
     logger.info("Closing database pool...")
     await db.close_db_pool()
@@ -101,6 +123,7 @@ app.include_router(auth_router)
 app.include_router(admin_router)
 app.include_router(product_router, prefix="/catalog", tags=["Products"])
 app.include_router(products_router, prefix="/catalog", tags=["Products"])
+app.include_router(trending_router, prefix="/catalog", tags=["Products"])
 app.include_router(sellers_categories_router)
 
 # Комментарии
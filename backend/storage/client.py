@@ -0,0 +1,58 @@
+from minio import Minio
+from minio.error import S3Error
+from functools import lru_cache
+from typing import BinaryIO, Optional
+from urllib.parse import urlparse
+import asyncio
+import os
+
+# Uploads of unknown size are sent in parts of this many bytes
+UPLOAD_PART_SIZE = 10 * 1024 * 1024
+
+class StorageClient:
+    """Async wrapper around the blocking MinIO client; every call runs in a thread."""
+
+    def __init__(self):
+        self.client: Optional[Minio] = None
+        self.bucket = os.getenv("MINIO_BUCKET_NAME", "meowshop")
+
+    async def initialize(self):
+        """Initialize the MinIO client and make sure the bucket exists"""
+        if not self.client:
+            endpoint = urlparse(os.getenv("MINIO_ENDPOINT", "http://minio:9000"))
+            client = Minio(
+                endpoint.netloc,
+                access_key=os.getenv("MINIO_ACCESS_KEY", "minioadmin"),
+                secret_key=os.getenv("MINIO_SECRET_KEY", "minioadmin"),
+                secure=endpoint.scheme == "https"
+            )
+            if not await asyncio.to_thread(client.bucket_exists, self.bucket):
+                try:
+                    await asyncio.to_thread(client.make_bucket, self.bucket)
+                except S3Error as e:
+                    # Another worker created it first
+                    if e.code not in ("BucketAlreadyOwnedByYou", "BucketAlreadyExists"):
+                        raise
+            self.client = client
+
+    def get_client(self) -> Minio:
+        if not self.client:
+            raise RuntimeError("MinIO client not initialized")
+        return self.client
+
+    async def upload(self, object_name: str, data: BinaryIO, length: int = -1):
+        await asyncio.to_thread(
+            self.get_client().put_object,
+            self.bucket, object_name, data, length,
+            part_size=UPLOAD_PART_SIZE if length < 0 else 0
+        )
+
+    async def download(self, object_name: str, file_path: str):
+        await asyncio.to_thread(self.get_client().fget_object, self.bucket, object_name, file_path)
+
+    async def remove(self, object_name: str):
+        await asyncio.to_thread(self.get_client().remove_object, self.bucket, object_name)
+
+@lru_cache()
+def get_storage_client() -> StorageClient:
+    return StorageClient()
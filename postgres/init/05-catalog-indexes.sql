@@ -0,0 +1,2 @@
+CREATE INDEX IF NOT EXISTS "idx_product_images_product_position" ON "Product_images"("product_id", "position");
+CREATE INDEX IF NOT EXISTS "idx_products_price_product" ON "Products"("price", "product_id");
@@ -0,0 +1,42 @@
+ALTER TABLE "Products" ADD COLUMN IF NOT EXISTS "rating_sum" INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE "Products" ADD COLUMN IF NOT EXISTS "rating_count" INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE "Products" ADD COLUMN IF NOT EXISTS "avg_rating" NUMERIC(4,2)
+    GENERATED ALWAYS AS (
+        CASE WHEN "rating_count" > 0 THEN ROUND("rating_sum"::numeric / "rating_count", 2) END
+    ) STORED;
+
+UPDATE "Products" p
+SET rating_sum = agg.rating_sum, rating_count = agg.rating_count
+FROM (
+    SELECT product_id, SUM(rating) AS rating_sum, COUNT(rating) AS rating_count
+    FROM "Comments"
+    WHERE rating IS NOT NULL
+    GROUP BY product_id
+) agg
+WHERE p.product_id = agg.product_id;
+
+CREATE INDEX IF NOT EXISTS "idx_products_avg_rating_product" ON "Products"("avg_rating", "product_id");
+
+CREATE OR REPLACE FUNCTION update_product_rating_aggregate()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.rating IS NOT NULL THEN
+        UPDATE "Products"
+        SET rating_sum = rating_sum - OLD.rating, rating_count = rating_count - 1
+        WHERE product_id = OLD.product_id;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.rating IS NOT NULL THEN
+        UPDATE "Products"
+        SET rating_sum = rating_sum + NEW.rating, rating_count = rating_count + 1
+        WHERE product_id = NEW.product_id;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trigger_update_product_rating_aggregate
+    AFTER INSERT OR DELETE OR UPDATE OF rating, product_id ON "Comments"
+    FOR EACH ROW
+    EXECUTE FUNCTION update_product_rating_aggregate();
@@ -0,0 +1,20 @@
+-- Change tracking for the incremental Elasticsearch sync.
+
+-- seller_name is denormalized into the search documents; a no-op update of the
+-- seller's products lets the outbox triggers (08) re-index them
+CREATE OR REPLACE FUNCTION touch_seller_products()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE "Products" p
+    SET seller_id = p.seller_id
+    FROM "Sellers" s
+    WHERE s.user_id = NEW.user_id AND p.seller_id = s.seller_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trigger_touch_seller_products
+    AFTER UPDATE OF username ON "Users"
+    FOR EACH ROW
+    WHEN (OLD.username IS DISTINCT FROM NEW.username)
+    EXECUTE FUNCTION touch_seller_products();
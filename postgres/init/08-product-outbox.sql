@@ -0,0 +1,52 @@
+-- Transactional outbox: every product mutation enqueues an indexing event in the
+-- same transaction, so Elasticsearch converges even for writes made outside the API.
+CREATE TABLE IF NOT EXISTS "Product_outbox" (
+    "id" BIGSERIAL PRIMARY KEY,
+    "product_id" INTEGER NOT NULL,
+    "operation" VARCHAR(10) NOT NULL CHECK ("operation" IN ('upsert', 'delete')),
+    "attempts" INTEGER NOT NULL DEFAULT 0,
+    -- Lease of the drainer working on the event; NULL when nobody is
+    "claimed_until" TIMESTAMPTZ,
+    "created_at" TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp()
+);
+
+CREATE INDEX IF NOT EXISTS "idx_product_outbox_pending" ON "Product_outbox"("id") WHERE "attempts" < 5;
+-- Dead letters: events whose document Elasticsearch rejected on every attempt
+CREATE INDEX IF NOT EXISTS "idx_product_outbox_dead" ON "Product_outbox"("id") WHERE "attempts" >= 5;
+
+CREATE OR REPLACE FUNCTION enqueue_product_upserts()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO "Product_outbox" (product_id, operation)
+    SELECT DISTINCT product_id, 'upsert' FROM changed_products;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION enqueue_product_deletes()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO "Product_outbox" (product_id, operation)
+    SELECT DISTINCT product_id, 'delete' FROM changed_products;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Statement-level with transition tables: one outbox insert per statement, not per row
+CREATE TRIGGER trigger_product_outbox_insert
+    AFTER INSERT ON "Products"
+    REFERENCING NEW TABLE AS changed_products
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION enqueue_product_upserts();
+
+CREATE TRIGGER trigger_product_outbox_update
+    AFTER UPDATE ON "Products"
+    REFERENCING NEW TABLE AS changed_products
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION enqueue_product_upserts();
+
+CREATE TRIGGER trigger_product_outbox_delete
+    AFTER DELETE ON "Products"
+    REFERENCING OLD TABLE AS changed_products
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION enqueue_product_deletes();
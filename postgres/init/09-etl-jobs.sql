@@ -0,0 +1,23 @@
+-- Background ETL uploads. The file lives in MinIO; the job row is the queue
+-- entry, the progress report and the resume checkpoint at the same time.
+CREATE TABLE IF NOT EXISTS "Etl_jobs" (
+    "job_id" UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    "seller_id" INTEGER NOT NULL REFERENCES "Sellers"("seller_id") ON DELETE CASCADE,
+    "filename" VARCHAR(255) NOT NULL,
+    "object_name" VARCHAR(255) NOT NULL,
+    "status" VARCHAR(20) NOT NULL DEFAULT 'queued' CHECK ("status" IN ('queued', 'running', 'done', 'failed')),
+    -- Input records consumed so far, valid or not; a resumed job skips this many
+    "rows_processed" BIGINT NOT NULL DEFAULT 0,
+    "rows_inserted" BIGINT NOT NULL DEFAULT 0,
+    "rows_rejected" BIGINT NOT NULL DEFAULT 0,
+    "rejected_rows" JSONB NOT NULL DEFAULT '[]',
+    "error" TEXT,
+    "attempts" INTEGER NOT NULL DEFAULT 0,
+    "created_at" TIMESTAMPTZ NOT NULL DEFAULT now(),
+    "started_at" TIMESTAMPTZ,
+    "heartbeat_at" TIMESTAMPTZ,
+    "finished_at" TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS "idx_etl_jobs_pending" ON "Etl_jobs"("created_at") WHERE "status" IN ('queued', 'running');
+CREATE INDEX IF NOT EXISTS "idx_etl_jobs_seller" ON "Etl_jobs"("seller_id", "created_at" DESC);
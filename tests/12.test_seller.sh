@@ -407,6 +407,54 @@ fi
 
 track_test "Product deletion verification" true
 
+# 11. Upload products file as a background ETL job
+echo -e "\n${BLUE}11. Uploading products file as an ETL job...${NC}"
+ETL_FILE=$(mktemp --suffix=.csv)
+cat > "$ETL_FILE" <<'CSV'
+product_name,description,category,price,in_stock
+ETL Product 1,Loaded by the ETL job,Test Category,10.50,5
+ETL Product 2,Loaded by the ETL job,Test Category,20,0
+ETL Broken,Price is not a number,Test Category,abc,1
+CSV
+
+UPLOAD_RESPONSE=$(curl -s -w "\n%{http_code}" -X POST "${BASE_URL}/catalog/etl/products/upload" \
+  -H "Authorization: Bearer ${TOKEN}" \
+  -F "file=@${ETL_FILE};filename=products.csv")
+rm -f "$ETL_FILE"
+
+HTTP_CODE=$(echo "$UPLOAD_RESPONSE" | tail -n1)
+RESPONSE_BODY=$(echo "$UPLOAD_RESPONSE" | head -n1)
+JOB_ID=$(echo "$RESPONSE_BODY" | jq -r '.job_id // empty')
+
+if [ "$HTTP_CODE" != "202" ] || [ -z "$JOB_ID" ]; then
+    track_test "ETL job upload" false
+    echo -e "${RED}✗ Expected 202 with a job_id, got $HTTP_CODE${NC}"
+    echo -e "Response body: $RESPONSE_BODY"
+    exit 1
+fi
+
+track_test "ETL job upload" true
+
+JOB_STATUS=""
+for _ in $(seq 1 30); do
+    JOB_RESPONSE=$(curl -s -X GET "${BASE_URL}/catalog/etl/jobs/${JOB_ID}" \
+      -H "Authorization: Bearer ${TOKEN}")
+    JOB_STATUS=$(echo "$JOB_RESPONSE" | jq -r '.status')
+    [ "$JOB_STATUS" = "done" ] || [ "$JOB_STATUS" = "failed" ] && break
+    sleep 1
+done
+
+echo -e "${BLUE}Job status: $(echo "$JOB_RESPONSE" | jq -c .)${NC}"
+if [ "$JOB_STATUS" != "done" ] \
+    || [ "$(echo "$JOB_RESPONSE" | jq -r '.rows_inserted')" != "2" ] \
+    || [ "$(echo "$JOB_RESPONSE" | jq -r '.rows_rejected')" != "1" ]; then
+    track_test "ETL job completion" false
+    echo -e "${RED}✗ Expected a finished job with 2 inserted and 1 rejected rows${NC}"
+    exit 1
+fi
+
+track_test "ETL job completion" true
+
 # Print final test summary
 print_test_summary
 
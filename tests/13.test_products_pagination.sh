@@ -0,0 +1,76 @@
+#!/bin/bash
+
+BASE_URL="http://localhost:8000"
+
+GREEN='\033[0;32m'
+RED='\033[0;31m'
+BLUE='\033[0;34m'
+NC='\033[0m'
+
+TOTAL_TESTS=0
+FAILED_TESTS=0
+
+check() {
+    local name="$1"
+    local result="$2"
+    TOTAL_TESTS=$((TOTAL_TESTS + 1))
+    if [ "$result" = "0" ]; then
+        echo -e "${GREEN}✓ $name${NC}"
+    else
+        FAILED_TESTS=$((FAILED_TESTS + 1))
+        echo -e "${RED}✗ $name${NC}"
+    fi
+}
+
+http_code() {
+    curl -s -o /dev/null -w "%{http_code}" "$1"
+}
+
+for SORT in "" "price_asc" "price_desc" "rating_asc" "rating_desc"; do
+    echo -e "${BLUE}📄 Обход каталога страницами по 3 товара, sort_by='${SORT:-product_id}'${NC}"
+
+    ALL_IDS=$(curl -s "$BASE_URL/catalog/products?limit=100&sort_by=$SORT" | jq -c '[.products[].product_id]')
+    PAGED_IDS="[]"
+    CURSOR=""
+    PAGES=0
+
+    while :; do
+        if [ -n "$CURSOR" ]; then
+            BODY=$(curl -s -G "$BASE_URL/catalog/products" -d "limit=3" -d "sort_by=$SORT" --data-urlencode "cursor=$CURSOR")
+        else
+            BODY=$(curl -s -G "$BASE_URL/catalog/products" -d "limit=3" -d "sort_by=$SORT")
+        fi
+        PAGES=$((PAGES + 1))
+
+        PAGE_SIZE=$(echo "$BODY" | jq '.products | length')
+        [ "$PAGE_SIZE" -le 3 ] || { check "Размер страницы не превышает limit" 1; break; }
+
+        PAGED_IDS=$(jq -c -n --argjson a "$PAGED_IDS" --argjson b "$(echo "$BODY" | jq -c '[.products[].product_id]')" '$a + $b')
+        CURSOR=$(echo "$BODY" | jq -r '.next_cursor // empty')
+        [ -z "$CURSOR" ] && break
+        [ "$PAGES" -gt 50 ] && break
+    done
+
+    if [ "$ALL_IDS" = "$PAGED_IDS" ]; then
+        check "Страницы совпадают с полной выборкой без пропусков и повторов ($PAGES стр.)" 0
+    else
+        echo "Ожидалось: $ALL_IDS"
+        echo "Получено:  $PAGED_IDS"
+        check "Страницы совпадают с полной выборкой без пропусков и повторов" 1
+    fi
+    echo -e "\n----------------------------\n"
+done
+
+echo -e "${BLUE}🚫 Проверка некорректных параметров${NC}"
+[ "$(http_code "$BASE_URL/catalog/products?cursor=not-a-cursor")" = "400" ]
+check "Некорректный курсор → 400" $?
+
+CURSOR=$(curl -s "$BASE_URL/catalog/products?limit=1&sort_by=price_asc" | jq -r '.next_cursor')
+[ "$(curl -s -o /dev/null -w "%{http_code}" -G "$BASE_URL/catalog/products" -d "sort_by=price_desc" --data-urlencode "cursor=$CURSOR")" = "400" ]
+check "Курсор от другой сортировки → 400" $?
+
+[ "$(http_code "$BASE_URL/catalog/products?limit=1000")" = "422" ]
+check "limit больше максимального → 422" $?
+
+echo -e "\nРезультат: $((TOTAL_TESTS - FAILED_TESTS))/$TOTAL_TESTS"
+[ "$FAILED_TESTS" -eq 0 ]
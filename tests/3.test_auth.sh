@@ -9,7 +9,7 @@ YELLOW='\033[1;33m'
 NC='\033[0m'
 
 # Счетчики тестов
-TOTAL_TESTS=10
+TOTAL_TESTS=12
 PASSED_TESTS=0
 declare -a FAILED_TESTS
 
@@ -260,6 +260,45 @@ else
     log_test_result "Проверка черного списка" "fail"
 fi
 
+# Проверка 11: Выход со всех устройств
+echo -e "\n${BLUE}7️⃣ Тестирование выхода со всех устройств...${NC}"
+login_session() {
+    curl -s -X POST "$API_URL/login" \
+        -H "Content-Type: application/json" \
+        -d "{
+            \"username\": \"$USERNAME\",
+            \"password\": \"$PASSWORD\"
+        }"
+}
+SESSION_A=$(login_session)
+SESSION_B=$(login_session)
+TOKEN_A=$(echo "$SESSION_A" | jq -r '.access_token')
+TOKEN_B=$(echo "$SESSION_B" | jq -r '.access_token')
+REFRESH_B=$(echo "$SESSION_B" | jq -r '.refresh_token')
+
+response=$(curl -s -w "\nHTTP_CODE:%{http_code}" -X POST "$API_URL/logout_all" \
+    -H "Authorization: Bearer $TOKEN_A")
+
+if check_status "$response"; then
+    log_test_result "Выход со всех устройств" "pass"
+else
+    log_test_result "Выход со всех устройств" "fail"
+fi
+
+# Проверка 12: Токены второй сессии отозваны
+echo -e "\n${BLUE}Проверка, что токены другой сессии отозваны...${NC}"
+me_response=$(curl -s -w "\nHTTP_CODE:%{http_code}" -X GET "$API_URL/me" \
+    -H "Authorization: Bearer $TOKEN_B")
+refresh_response=$(curl -s -w "\nHTTP_CODE:%{http_code}" -X POST "$API_URL/refresh" \
+    -H "Content-Type: application/json" \
+    -d "{\"refresh_token\": \"$REFRESH_B\"}")
+
+if check_status "$me_response" "401" && check_status "$refresh_response" "401"; then
+    log_test_result "Отзыв токенов других сессий" "pass"
+else
+    log_test_result "Отзыв токенов других сессий" "fail"
+fi
+
 # Итоговая статистика
 echo -e "\n${BLUE}=== Итоги тестирования ===${NC}"
 if [ $PASSED_TESTS -eq $TOTAL_TESTS ]; then
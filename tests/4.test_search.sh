@@ -11,7 +11,7 @@ YELLOW='\033[1;33m'
 NC='\033[0m'
 
 # Счетчики тестов
-TOTAL_TESTS=13
+TOTAL_TESTS=16
 PASSED_TESTS=0
 declare -a FAILED_TESTS
 
@@ -437,6 +437,68 @@ if check_status "$response" "422"; then
 else
     log_test_result "Отсутствующий параметр поиска" "fail"
 fi
+echo -e "\n${BLUE}----------------------------${NC}\n"
+
+echo -e "${BLUE}1️⃣4️⃣ Тестирование курсорной пагинации (search_after)...${NC}"
+echo "Первая страница с курсором:"
+response=$(curl -s -w "\nHTTP_CODE:%{http_code}" -X GET -G "$BASE_URL/catalog/search/search" \
+    --data-urlencode "q=смартфон наушники" -d "page_size=1" -d "use_cursor=true")
+
+if check_status "$response"; then
+    RESPONSE_BODY=$(get_response_body "$response")
+    echo "$RESPONSE_BODY" | jq '.'
+    FIRST_ID=$(echo "$RESPONSE_BODY" | jq -r '.items[0].product_id')
+    NEXT_CURSOR=$(echo "$RESPONSE_BODY" | jq -r '.next_cursor')
+
+    response=$(curl -s -w "\nHTTP_CODE:%{http_code}" -X GET -G "$BASE_URL/catalog/search/search" \
+        --data-urlencode "q=смартфон наушники" -d "page_size=1" --data-urlencode "cursor=$NEXT_CURSOR")
+    if [[ "$NEXT_CURSOR" != "null" ]] && check_status "$response"; then
+        RESPONSE_BODY=$(get_response_body "$response")
+        echo "$RESPONSE_BODY" | jq '.'
+        SECOND_ID=$(echo "$RESPONSE_BODY" | jq -r '.items[0].product_id')
+        if [[ "$SECOND_ID" != "null" && "$SECOND_ID" != "$FIRST_ID" ]]; then
+            echo -e "${GREEN}✓ Вторая страница вернула другой товар${NC}"
+            log_test_result "Курсорная пагинация" "pass"
+        else
+            echo -e "${RED}✗ Вторая страница повторяет первую или пуста${NC}"
+            log_test_result "Курсорная пагинация" "fail"
+        fi
+    else
+        log_test_result "Курсорная пагинация" "fail"
+    fi
+else
+    log_test_result "Курсорная пагинация" "fail"
+fi
+echo -e "\n${BLUE}----------------------------${NC}\n"
+
+echo -e "${BLUE}1️⃣5️⃣ Тестирование курсора от другого запроса...${NC}"
+response=$(curl -s -w "\nHTTP_CODE:%{http_code}" -X GET -G "$BASE_URL/catalog/search/search" \
+    --data-urlencode "q=кофемашина" -d "page_size=1" --data-urlencode "cursor=$NEXT_CURSOR")
+
+if check_status "$response" "400"; then
+    log_test_result "Курсор от другого запроса" "pass"
+else
+    log_test_result "Курсор от другого запроса" "fail"
+fi
+echo -e "\n${BLUE}----------------------------${NC}\n"
+
+echo -e "${BLUE}1️⃣6️⃣ Тестирование фасетов с фильтром по цене...${NC}"
+response=$(curl -s -w "\nHTTP_CODE:%{http_code}" -X GET -G "$BASE_URL/catalog/search/search" \
+    --data-urlencode "q=смартфон наушники" -d "min_price=1000" -d "facets=true")
+
+if check_status "$response"; then
+    RESPONSE_BODY=$(get_response_body "$response")
+    echo "$RESPONSE_BODY" | jq '.facets'
+    if echo "$RESPONSE_BODY" | jq -e '(.facets | has("category") and has("seller") and has("price") and has("rating")) and all(.items[]; .price >= 1000)' > /dev/null; then
+        echo -e "${GREEN}✓ Фасеты получены, товары отфильтрованы по цене${NC}"
+        log_test_result "Фасеты поиска" "pass"
+    else
+        echo -e "${RED}✗ Нет фасетов или фильтр по цене не применён${NC}"
+        log_test_result "Фасеты поиска" "fail"
+    fi
+else
+    log_test_result "Фасеты поиска" "fail"
+fi
 
 # Итоговая статистика
 echo -e "\n${BLUE}=== Итоги тестирования ===${NC}"
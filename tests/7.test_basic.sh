@@ -90,4 +90,10 @@ echo -e "\n----------------------------\n"
 
 echo "23. Проверка в sellers_categories.py сортировки по количеству продаж"
 curl -s "http://localhost:8000/catalog/sellers/?sort_by=sales" | jq
+echo -e "\n----------------------------\n"
+
+echo "24. Проверка trending.py (просмотр товара попадает в тренды после сброса буфера)"
+curl -s http://localhost:8000/catalog/product/7 > /dev/null
+sleep 2
+curl -s "http://localhost:8000/catalog/trending?limit=5&window_minutes=5" | jq
 echo -e "\n----------------------------\n"
\ No newline at end of file